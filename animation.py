@@ -0,0 +1,69 @@
+from PyQt6.QtCore import QObject, QTimer, QElapsedTimer, Qt, pyqtSignal
+from metrics import metrics
+
+DEFAULT_REFRESH_RATE = 60.0
+
+# Monotonic clock shared by everything that timestamps arrows. Unlike the
+# wall clock it never jumps at midnight or when the system time changes.
+_clock = QElapsedTimer()
+_clock.start()
+
+
+_now = _clock.elapsed
+
+
+def now_ms():
+    """Return milliseconds elapsed on the monotonic animation clock."""
+    return _now()
+
+
+def use_clock(now):
+    """Make now_ms() return now() instead, e.g. a recording's replay time."""
+    global _now
+    _now = now
+
+
+class AnimationScheduler(QObject):
+    """Frame timer that only runs while something is animating.
+
+    Call request() whenever an animation starts; the scheduler then emits
+    frame once per display refresh until stop() is called, so an idle
+    overlay never wakes up.
+    """
+
+    frame = pyqtSignal()  # Emitted once per display frame while running
+
+    def __init__(self, refresh_rate=DEFAULT_REFRESH_RATE, parent=None):
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+        self.set_refresh_rate(refresh_rate)
+
+    def set_refresh_rate(self, refresh_rate):
+        """Tick at the given display refresh rate in Hz."""
+        if refresh_rate <= 0:
+            refresh_rate = DEFAULT_REFRESH_RATE
+        self._timer.setInterval(max(1, round(1000 / refresh_rate)))
+
+    def interval(self):
+        """Return the frame interval in milliseconds."""
+        return self._timer.interval()
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def request(self):
+        """Start ticking if not already running."""
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+        if metrics.enabled:
+            metrics.timer_stopped()
+
+    def _tick(self):
+        if metrics.enabled:
+            metrics.timer_tick(self._timer.interval())
+        self.frame.emit()
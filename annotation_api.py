@@ -0,0 +1,187 @@
+"""Local socket for placing arrows from scripts, and a CLI client for it.
+
+Each request is one line of JSON, answered by one line of JSON:
+
+    {"arrows": [[x1, y1, x2, y2], [x1, y1, x2, y2, "#00ff00"], ...],
+     "color": "#ff0000", "dissolving": false, "lifetime": 2000}
+    {"clear": true}
+
+Every arrows request is inserted as one batch with a single repaint and
+is undone as one step.
+
+lifetime is how many milliseconds dissolving arrows take to fade, at least
+1, and defaults to the overlay's current lifetime. Normal arrows never
+expire and ignore it. 0, which means "never expires" elsewhere, is
+rejected rather than making dissolving arrows vanish on the next frame.
+
+Usage of the client:
+
+    python annotation_api.py [--color C] [--dissolving] [FILE]
+
+reads one arrow per line, as "x1 y1 x2 y2 [color]" or a JSON array, and
+sends them all as a single request.
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+from PyQt6.QtCore import QObject
+from PyQt6.QtGui import QColor
+from PyQt6.QtNetwork import QLocalServer, QLocalSocket
+
+DEFAULT_NAME = "arrows-annotations"
+TIMEOUT_MS = 5000  # How long the client waits for the overlay
+COORDINATE_LIMIT = 2**30  # Stored as int32, with room left for the heads
+LIFETIME_LIMIT = 2**32 - 1  # Lifetimes are stored as uint32 milliseconds
+
+
+def parse_color(value):
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid color: {value!r}")
+    color = QColor(value)
+    if not color.isValid():
+        raise ValueError(f"Invalid color: {value!r}")
+    return color
+
+
+def parse_int(value, name, low, high):
+    """Return value as an int if it is a finite number within [low, high]."""
+    if (
+        isinstance(value, bool)
+        or not isinstance(value, (int, float))
+        or not math.isfinite(value)
+        or not low <= value <= high
+    ):
+        raise ValueError(f"{name} must be a number from {low} to {high}: {value!r}")
+    return int(value)
+
+
+def parse_request_arrow(arrow):
+    """Return (x1, y1, x2, y2[, rgba]) for one arrow of a request."""
+    if not isinstance(arrow, list) or len(arrow) not in (4, 5):
+        raise ValueError(f"Expected [x1, y1, x2, y2, color?]: {arrow!r}")
+    coordinates = tuple(
+        parse_int(value, "Coordinate", -COORDINATE_LIMIT, COORDINATE_LIMIT)
+        for value in arrow[:4]
+    )
+    if len(arrow) == 5:
+        return coordinates + (parse_color(arrow[4]).rgba(),)
+    return coordinates
+
+
+class AnnotationServer(QObject):
+    """Serve annotation requests on a QLocalServer for one window.
+
+    The server runs on the GUI event loop, so requests are applied as they
+    are read with no locking. Only the current user may connect.
+    """
+
+    def __init__(self, window, name=DEFAULT_NAME):
+        super().__init__(window)
+        self.window = window
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
+        QLocalServer.removeServer(name)  # Left behind if the overlay crashed
+        if not self.server.listen(name):
+            raise OSError(f"Cannot listen on {name}: {self.server.errorString()}")
+        self.server.newConnection.connect(self.accept)
+
+    def accept(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def read(self, socket):
+        while socket.canReadLine():
+            line = bytes(socket.readLine()).strip()
+            if not line:
+                continue
+            try:
+                reply = self.handle(json.loads(line))
+            except ValueError as error:
+                reply = {"error": str(error)}
+            except Exception as error:
+                # An exception escaping a slot aborts the overlay, so no
+                # request may raise out of here, whatever it contains
+                reply = {"error": f"{type(error).__name__}: {error}"}
+            socket.write(json.dumps(reply).encode() + b"\n")
+
+    def handle(self, request):
+        """Validate one decoded request, apply it and return the reply.
+
+        Everything is checked before the window is touched, so a bad
+        request raises ValueError and changes nothing.
+        """
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object")
+        window = self.window
+        if request.get("clear"):
+            window.clear_arrows()
+            return {"cleared": True}
+        if not isinstance(request.get("arrows"), list):
+            raise ValueError('A request needs "arrows" or "clear"')
+        arrows = [parse_request_arrow(arrow) for arrow in request["arrows"]]
+        color = request.get("color")
+        color = parse_color(color) if color is not None else None
+        lifetime = request.get("lifetime")
+        if lifetime is not None:
+            lifetime = parse_int(lifetime, "lifetime", 1, LIFETIME_LIMIT)
+        ids = window.add_arrows(
+            arrows, color, bool(request.get("dissolving")), lifetime
+        )
+        return {"added": len(ids)}
+
+
+def parse_arrow(line):
+    """Parse 'x1 y1 x2 y2 [color]' or a JSON array into a request arrow."""
+    if line.startswith("["):
+        return json.loads(line)
+    fields = line.split()
+    if len(fields) not in (4, 5):
+        raise ValueError(f"Expected x1 y1 x2 y2 [color]: {line!r}")
+    return [int(field) for field in fields[:4]] + fields[4:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Place arrows on a running overlay")
+    parser.add_argument("file", nargs="?", help="arrows, one per line (default: stdin)")
+    parser.add_argument("--color", help="color of arrows without their own")
+    parser.add_argument("--dissolving", action="store_true")
+    parser.add_argument("--lifetime", type=int, help="dissolving lifetime in ms")
+    parser.add_argument("--clear", action="store_true", help="clear all arrows")
+    parser.add_argument(
+        "--name", default=os.environ.get("ARROWS_API_NAME", DEFAULT_NAME)
+    )
+    args = parser.parse_args()
+
+    if args.clear:
+        request = {"clear": True}
+    else:
+        with open(args.file) if args.file else sys.stdin as f:
+            arrows = [parse_arrow(line.strip()) for line in f if line.strip()]
+        request = {"arrows": arrows, "dissolving": args.dissolving}
+        if args.color:
+            request["color"] = args.color
+        if args.lifetime is not None:
+            request["lifetime"] = args.lifetime
+
+    socket = QLocalSocket()
+    socket.connectToServer(args.name)
+    if not socket.waitForConnected(TIMEOUT_MS):
+        sys.exit(f"Cannot reach the overlay at {args.name}: {socket.errorString()}")
+    socket.write(json.dumps(request).encode() + b"\n")
+    socket.waitForBytesWritten(TIMEOUT_MS)
+    while not socket.canReadLine():
+        if not socket.waitForReadyRead(TIMEOUT_MS):
+            sys.exit("No reply from the overlay")
+    reply = json.loads(bytes(socket.readLine()))
+    print(json.dumps(reply))
+    if "error" in reply:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
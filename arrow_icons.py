@@ -1,6 +1,9 @@
-from PyQt6.QtGui import QIcon, QPixmap, QPainter, QPen, QColor
-from PyQt6.QtCore import Qt
+from functools import lru_cache
+from PyQt6.QtGui import QIcon, QPixmap, QPainter, QPainterPath, QPen, QColor, QPolygon
+from PyQt6.QtCore import Qt, QPoint
 
+# Icons are rendered once per distinct argument set and then reused
+@lru_cache(maxsize=None)
 def create_arrow_icon(color=Qt.GlobalColor.black, dissolving=False):
     pixmap = QPixmap(32, 32)
     pixmap.fill(Qt.GlobalColor.transparent)
@@ -28,3 +31,81 @@ def create_arrow_icon(color=Qt.GlobalColor.black, dissolving=False):
     
     painter.end()
     return QIcon(pixmap)
+
+
+@lru_cache(maxsize=None)
+def create_pen_icon(color=Qt.GlobalColor.black):
+    pixmap = QPixmap(32, 32)
+    pixmap.fill(Qt.GlobalColor.transparent)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+    pen = QPen(color)
+    pen.setWidth(2)
+    pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+    painter.setPen(pen)
+
+    # Draw a squiggle
+    path = QPainterPath()
+    path.moveTo(5, 22)
+    path.cubicTo(10, 6, 14, 6, 16, 16)
+    path.cubicTo(18, 26, 22, 26, 27, 10)
+    painter.drawPath(path)
+
+    painter.end()
+    return QIcon(pixmap)
+
+
+@lru_cache(maxsize=None)
+def create_toggle_icon(width, height, is_expanded):
+    pixmap = QPixmap(width, height)
+    pixmap.fill(Qt.GlobalColor.transparent)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+    # Draw arrow centered in button - arrow points up when collapsed, down when expanded
+    center_x = width // 2
+    points = QPolygon([
+        QPoint(center_x - 10, 14 if is_expanded else 6),  # Reversed logic
+        QPoint(center_x, 6 if is_expanded else 14),  # Reversed logic
+        QPoint(center_x + 10, 14 if is_expanded else 6),  # Reversed logic
+    ])
+
+    painter.setPen(QPen(QColor(200, 200, 200), 2))
+    painter.setBrush(QColor(200, 200, 200))
+    painter.drawPolygon(points)
+    painter.end()
+    return QIcon(pixmap)
+
+
+@lru_cache(maxsize=None)
+def create_shape_icon(kind, color=Qt.GlobalColor.black):
+    pixmap = QPixmap(32, 32)
+    pixmap.fill(Qt.GlobalColor.transparent)
+
+    painter = QPainter(pixmap)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+
+    pen = QPen(color)
+    pen.setWidth(2)
+    painter.setPen(pen)
+
+    if kind == "rectangle":
+        painter.drawRect(5, 8, 22, 16)
+    elif kind == "ellipse":
+        painter.drawEllipse(4, 8, 24, 16)
+    elif kind == "highlight":
+        # A translucent box over a line of "text"
+        painter.drawLine(6, 16, 26, 16)
+        painter.fillRect(4, 10, 24, 12, QColor(255, 220, 0, 140))
+    else:
+        font = painter.font()
+        font.setPixelSize(24)
+        font.setBold(True)
+        painter.setFont(font)
+        painter.drawText(pixmap.rect(), Qt.AlignmentFlag.AlignCenter, "T")
+
+    painter.end()
+    return QIcon(pixmap)
@@ -0,0 +1,299 @@
+import math
+import sys
+from array import array
+from bisect import bisect_left
+from itertools import compress, islice
+
+KIND_NORMAL = 0
+KIND_DISSOLVING = 1
+
+DEFAULT_HEAD_LENGTH = 20
+DEFAULT_HEAD_ANGLE = 30  # degrees
+BULK_REMOVE_MIN = 32  # Removing more arrows than this rebuilds the columns
+
+# Typecodes of the per-arrow columns: coordinates, arrowhead barb endpoints,
+# packed ARGB color, creation time and lifetime in milliseconds (0 for
+# arrows that never expire), arrow kind and a stable id
+COLUMNS = (
+    ("x1", "i"),
+    ("y1", "i"),
+    ("x2", "i"),
+    ("y2", "i"),
+    ("hx1", "i"),
+    ("hy1", "i"),
+    ("hx2", "i"),
+    ("hy2", "i"),
+    ("rgba", "I"),
+    ("created", "q"),
+    ("lifetime", "I"),
+    ("kind", "B"),
+    ("id", "Q"),
+)
+
+
+def arrow_head(x1, y1, x2, y2, length=DEFAULT_HEAD_LENGTH, angle=DEFAULT_HEAD_ANGLE):
+    """Return (hx1, hy1, hx2, hy2), the endpoints of the two arrowhead barbs."""
+    theta = math.radians(180 - angle)
+    return barbs(x1, y1, x2, y2, length, math.cos(theta), math.sin(theta))
+
+
+def barbs(x1, y1, x2, y2, length, cos_a, sin_a):
+    """Return the barb endpoints for the cosine and sine of 180 - angle.
+
+    The barbs are the unit shaft vector rotated by 180 +/- angle degrees. A
+    zero-length shaft points along +x, the direction atan2(0, 0) gives.
+    """
+    dx, dy = x2 - x1, y2 - y1
+    norm = math.hypot(dx, dy)
+    ux, uy = (dx / norm, dy / norm) if norm else (1.0, 0.0)
+    return (
+        int(x2 + length * (ux * cos_a - uy * sin_a)),
+        int(y2 + length * (ux * sin_a + uy * cos_a)),
+        int(x2 + length * (ux * cos_a + uy * sin_a)),
+        int(y2 + length * (uy * cos_a - ux * sin_a)),
+    )
+
+
+def arrow_heads(x1s, y1s, x2s, y2s, length, angle):
+    """Return the hx1, hy1, hx2 and hy2 columns for columns of shafts.
+
+    The rotation terms are computed once for all arrows, and every head
+    matches what arrow_head() returns for the same shaft.
+    """
+    theta = math.radians(180 - angle)
+    cos_a, sin_a = math.cos(theta), math.sin(theta)
+    heads = [
+        barbs(x1, y1, x2, y2, length, cos_a, sin_a)
+        for x1, y1, x2, y2 in zip(x1s, y1s, x2s, y2s)
+    ]
+    if not heads:
+        return [], [], [], []
+    return tuple(list(column) for column in zip(*heads))
+
+
+class ArrowStore:
+    """Struct-of-arrays storage for committed arrows.
+
+    Every field lives in its own typed array, so an arrow costs a few dozen
+    bytes instead of a tuple holding QPoint and QColor wrappers. Arrows are
+    kept in the order they were appended, which is also creation order.
+    Arrowhead vertices are computed once when an arrow is appended.
+
+    Each arrow gets an id that never changes while it is stored. Ids grow
+    with every append and rows stay sorted by id, so an id is resolved to
+    its current index with a binary search.
+
+    version is bumped by every change, so renderers caching the columns can
+    tell when they are stale.
+    """
+
+    def __init__(self, head_length=DEFAULT_HEAD_LENGTH, head_angle=DEFAULT_HEAD_ANGLE):
+        self.head_length = head_length
+        self.head_angle = head_angle
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode))
+        self.next_id = 0
+        self.version = 0
+
+    def __len__(self):
+        return len(self.kind)
+
+    def append(self, x1, y1, x2, y2, rgba, created, kind=KIND_NORMAL, lifetime=0):
+        """Append an arrow and return its id."""
+        self.version += 1
+        self.x1.append(x1)
+        self.y1.append(y1)
+        self.x2.append(x2)
+        self.y2.append(y2)
+        hx1, hy1, hx2, hy2 = arrow_head(
+            x1, y1, x2, y2, self.head_length, self.head_angle
+        )
+        self.hx1.append(hx1)
+        self.hy1.append(hy1)
+        self.hx2.append(hx2)
+        self.hy2.append(hy2)
+        self.rgba.append(rgba)
+        self.created.append(created)
+        self.lifetime.append(lifetime)
+        self.kind.append(kind)
+        arrow_id = self.next_id
+        self.id.append(arrow_id)
+        self.next_id += 1
+        return arrow_id
+
+    def append_many(self, arrows, kind=KIND_NORMAL):
+        """Append (x1, y1, x2, y2, rgba, created, lifetime) tuples in one go.
+
+        Heads are computed column-wide and each column grows once. Returns
+        the range of ids given to the arrows.
+        """
+        columns = list(zip(*arrows))
+        if not columns:
+            return range(self.next_id, self.next_id)
+        x1, y1, x2, y2, rgba, created, lifetime = columns
+        heads = arrow_heads(x1, y1, x2, y2, self.head_length, self.head_angle)
+        ids = range(self.next_id, self.next_id + len(x1))
+        self.extend_columns(
+            (x1, y1, x2, y2, *heads, rgba, created, lifetime, [kind] * len(ids), ids)
+        )
+        self.next_id = ids.stop
+        return ids
+
+    def extend_columns(self, columns):
+        """Extend every column with the values given in column order.
+
+        All values are converted to typed arrays first, so a value out of
+        range or of the wrong type raises before any column has grown and
+        the columns always stay the same length.
+        """
+        converted = [
+            array(typecode, values) for (_, typecode), values in zip(COLUMNS, columns)
+        ]
+        self.version += 1
+        for (name, _), values in zip(COLUMNS, converted):
+            getattr(self, name).extend(values)
+
+    def extend(self, rows):
+        """Append rows in column order, ids included, growing each column once.
+
+        The ids must be larger than any id already stored.
+        """
+        columns = list(zip(*rows))
+        if columns:
+            self.extend_columns(columns)
+            self.next_id = max(self.next_id, self.id[-1] + 1)
+
+    def clear(self):
+        self.version += 1
+        for name, _ in COLUMNS:
+            del getattr(self, name)[:]
+
+    def index_of(self, arrow_id):
+        """Return the current index of an arrow id, or None if not stored."""
+        i = bisect_left(self.id, arrow_id)
+        if i < len(self.id) and self.id[i] == arrow_id:
+            return i
+        return None
+
+    def row(self, i):
+        """Return the arrow at index i as a tuple in column order."""
+        return tuple(getattr(self, name)[i] for name, _ in COLUMNS)
+
+    def segments(self, i):
+        """Return the shaft and head barbs of the arrow at index i."""
+        x2, y2 = self.x2[i], self.y2[i]
+        return (
+            (self.x1[i], self.y1[i], x2, y2),
+            (x2, y2, self.hx1[i], self.hy1[i]),
+            (x2, y2, self.hx2[i], self.hy2[i]),
+        )
+
+    def remove(self, arrow_id):
+        """Remove an arrow by id and return its row, or None if not stored."""
+        self.version += 1
+        i = self.index_of(arrow_id)
+        if i is None:
+            return None
+        row = self.row(i)
+        for name, _ in COLUMNS:
+            del getattr(self, name)[i]
+        return row
+
+    def remove_many(self, ids):
+        """Remove several arrows by id at once, ignoring repeated ids.
+
+        A contiguous run, such as the oldest arrows expiring together, is
+        sliced out of each column at once. Otherwise a few are deleted one
+        by one; more than BULK_REMOVE_MIN rebuild each column in a single
+        pass instead of shifting it once per arrow.
+        """
+        self.version += 1
+        indices = sorted({i for i in map(self.index_of, ids) if i is not None})
+        if not indices:
+            return
+        first, last = indices[0], indices[-1]
+        if last - first + 1 == len(indices):
+            for name, _ in COLUMNS:
+                del getattr(self, name)[first : last + 1]
+            return
+        if len(indices) <= BULK_REMOVE_MIN:
+            for i in reversed(indices):
+                for name, _ in COLUMNS:
+                    del getattr(self, name)[i]
+            return
+        keep = bytearray(b"\x01") * len(self)
+        for i in indices:
+            keep[i] = 0
+        for name, typecode in COLUMNS:
+            setattr(self, name, array(typecode, compress(getattr(self, name), keep)))
+
+    def insert(self, row):
+        """Put back a row returned by remove(), keeping the id order."""
+        self.version += 1
+        i = bisect_left(self.id, row[-1])
+        for (name, _), value in zip(COLUMNS, row):
+            getattr(self, name).insert(i, value)
+
+    def move(self, arrow_id, dx, dy):
+        """Translate an arrow, including its head, by (dx, dy)."""
+        self.version += 1
+        i = self.index_of(arrow_id)
+        for name in ("x1", "x2", "hx1", "hx2"):
+            getattr(self, name)[i] += dx
+        for name in ("y1", "y2", "hy1", "hy2"):
+            getattr(self, name)[i] += dy
+
+    def rows(self, start=0):
+        """Iterate rows of (x1, y1, x2, y2, hx1, hy1, hx2, hy2, rgba, created,
+        lifetime, kind, id), from index start on.
+
+        The columns are zipped directly, so nothing is copied.
+        """
+        return islice(zip(*(getattr(self, name) for name, _ in COLUMNS)), start, None)
+
+    def set_head_geometry(self, length, angle):
+        """Change the arrowhead size and angle and recompute every head."""
+        self.version += 1
+        self.head_length = length
+        self.head_angle = angle
+        self.hx1, self.hy1, self.hx2, self.hy2 = (
+            array("i", column)
+            for column in arrow_heads(self.x1, self.y1, self.x2, self.y2, length, angle)
+        )
+
+    def extent(self, start=0):
+        """Return (left, top, right, bottom) over the endpoints of the arrows
+        from index start on, or None if there are none."""
+        if start >= len(self.kind):
+            return None
+        if start:
+            x1, y1, x2, y2 = (
+                self.x1[start:],
+                self.y1[start:],
+                self.x2[start:],
+                self.y2[start:],
+            )
+        else:
+            x1, y1, x2, y2 = self.x1, self.y1, self.x2, self.y2
+        return (
+            min(min(x1), min(x2)),
+            min(min(y1), min(y2)),
+            max(max(x1), max(x2)),
+            max(max(y1), max(y2)),
+        )
+
+    def remove_first(self, count):
+        """Drop the first (oldest) count arrows, slicing each column at once."""
+        self.version += 1
+        if count:
+            for name, _ in COLUMNS:
+                del getattr(self, name)[:count]
+
+    def memory_usage(self):
+        """Return the bytes allocated by the columns, including spare capacity."""
+        return sum(sys.getsizeof(getattr(self, name)) for name, _ in COLUMNS)
+
+    @staticmethod
+    def bytes_per_arrow():
+        """Return the storage cost of a single arrow in bytes."""
+        return sum(array(typecode).itemsize for _, typecode in COLUMNS)
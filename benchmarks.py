@@ -0,0 +1,842 @@
+"""Headless benchmarks for the overlay's hot paths.
+
+Run on any Linux box without a display:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks.py --output bench.json
+
+Results are written as JSON so runs from different commits can be diffed.
+With --check, regression checks run instead and any failure raises;
+--check --renderer opengl also compares an OpenGL frame with a raster one.
+The OpenGL renderer needs a GL 4.1 context, which Mesa's llvmpipe provides
+under a virtual X server:
+
+    LIBGL_ALWAYS_SOFTWARE=1 QT_QPA_PLATFORM=xcb xvfb-run python benchmarks.py --renderer opengl
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from array import array
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QEvent, QObject, QPoint, QPointF, QRect, Qt, QT_VERSION_STR
+from PyQt6.QtGui import QColor, QImage, QMouseEvent, QPainter, QPen
+from PyQt6.QtWidgets import QApplication
+
+DEFAULT_SIZES = (10, 1000, 10000, 100000)
+COLORS = [QColor(255, 0, 0), QColor(0, 160, 255), QColor(40, 200, 40)]
+
+
+def summarize(name, samples, **params):
+    """Return a result record for a list of durations in seconds."""
+    ms = sorted(sample * 1000 for sample in samples)
+    return {
+        "name": name,
+        "params": params,
+        "unit": "ms",
+        "runs": len(ms),
+        "min": ms[0],
+        "mean": statistics.fmean(ms),
+        "median": statistics.median(ms),
+        "p95": ms[min(len(ms) - 1, int(len(ms) * 0.95))],
+        "max": ms[-1],
+    }
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def mouse_event(event_type, x, y, button=Qt.MouseButton.LeftButton):
+    buttons = button if event_type != QEvent.Type.MouseButtonRelease else None
+    return QMouseEvent(
+        event_type,
+        QPointF(x, y),
+        QPointF(x, y),
+        button,
+        buttons or Qt.MouseButton.NoButton,
+        Qt.KeyboardModifier.NoModifier,
+    )
+
+
+def make_window(screen_drawer, idle=False):
+    """Show an overlay, kept mapped full-screen unless idle is set."""
+    window = screen_drawer.TransparentWindow()
+    window.idle_unmap = idle
+    window.show()
+    QApplication.processEvents()
+    return window
+
+
+def populate(window, count, is_dissolving=False, seed=0):
+    """Add count random arrows spread over the window."""
+    rng = random.Random(seed)
+    width, height = window.width(), window.height()
+    for i in range(count):
+        x, y = rng.randrange(width), rng.randrange(height)
+        end = QPoint(x + rng.randint(-200, 200), y + rng.randint(-200, 200))
+        window.add_arrow(QPoint(x, y), end, COLORS[i % len(COLORS)], is_dissolving)
+
+
+def bench_paint(screen_drawer, sizes, repeat):
+    results = []
+    for count in sizes:
+        window = make_window(screen_drawer)
+        widget = window.transparent_widget
+        populate(window, count)
+
+        # First paint rasterizes every committed arrow into the arrow layer
+        widget.invalidate_arrow_layer()
+        samples = timed(widget.repaint, 1)
+        results.append(summarize("paint_layer_build", samples, arrows=count))
+
+        samples = timed(widget.repaint, repeat)
+        results.append(summarize("paint_full", samples, arrows=count))
+
+        samples = timed(lambda: widget.repaint(100, 100, 120, 120), repeat)
+        results.append(summarize("paint_dirty_rect", samples, arrows=count))
+
+        window.clear_arrows()
+        populate(window, count, is_dissolving=True)
+        samples = timed(widget.repaint, repeat)
+        results.append(summarize("paint_dissolving", samples, arrows=count))
+        window.close()
+    return results
+
+
+def bench_mouse_stream(screen_drawer, sizes, repeat, moves=200):
+    """Drive press/move/release through the event system, painting each move."""
+    results = []
+    for count in sizes:
+        window = make_window(screen_drawer)
+        widget = window.transparent_widget
+        populate(window, count)
+        window.toggle_drawing_mode()
+        QApplication.processEvents()
+
+        def stroke():
+            QApplication.sendEvent(
+                widget, mouse_event(QEvent.Type.MouseButtonPress, 50, 50)
+            )
+            for step in range(moves):
+                QApplication.sendEvent(
+                    widget,
+                    mouse_event(QEvent.Type.MouseMove, 50 + step, 50 + step // 2),
+                )
+                QApplication.processEvents()
+            QApplication.sendEvent(
+                widget,
+                mouse_event(
+                    QEvent.Type.MouseButtonRelease, 50 + moves, 50 + moves // 2
+                ),
+            )
+            QApplication.processEvents()
+
+        samples = [sample / (moves + 2) for sample in timed(stroke, repeat)]
+        results.append(summarize("mouse_event", samples, arrows=count, moves=moves))
+        window.close()
+    return results
+
+
+def bench_bulk_insert(screen_drawer, sizes, repeat):
+    """add_arrows() plus its one repaint, against committing one by one."""
+    results = []
+    for count in sizes:
+        rng = random.Random(0)
+        arrows = []
+        for _ in range(count):
+            x, y = rng.randrange(1920), rng.randrange(1080)
+            arrows.append(
+                (x, y, x + rng.randint(-200, 200), y + rng.randint(-200, 200))
+            )
+        window = make_window(screen_drawer)
+        widget = window.transparent_widget
+        widget.repaint()
+
+        def insert():
+            window.add_arrows(arrows)
+            widget.repaint()
+            window.clear_arrows()
+
+        samples = timed(insert, max(1, repeat // 5))
+        results.append(summarize("bulk_insert", samples, arrows=count))
+
+        def insert_one_by_one():
+            for x1, y1, x2, y2 in arrows:
+                window.add_arrow(QPoint(x1, y1), QPoint(x2, y2), COLORS[0], False)
+            widget.repaint()
+            window.clear_arrows()
+
+        samples = timed(insert_one_by_one, 1)
+        results.append(summarize("one_by_one_insert", samples, arrows=count))
+        window.close()
+    return results
+
+
+def bench_dissolve(screen_drawer, sizes, repeat):
+    results = []
+    for count in sizes:
+        window = make_window(screen_drawer)
+        populate(window, count, is_dissolving=True)
+        samples = timed(window.update_dissolving_arrows, repeat)
+        results.append(summarize("update_dissolving_arrows", samples, arrows=count))
+
+        # Expire everything at once by backdating the creation times
+        window.dissolving_arrows.created = array("q", [-(10**9)] * count)
+        window.expiry.clear()
+        for arrow_id in window.dissolving_arrows.id:
+            window.expiry.push(0, arrow_id)
+        samples = timed(window.update_dissolving_arrows, 1)
+        results.append(summarize("expire_dissolving_arrows", samples, arrows=count))
+        window.close()
+    return results
+
+
+def bench_draw_arrow(screen_drawer, repeat, calls=10000):
+    window = make_window(screen_drawer)
+    image = QImage(1920, 1080, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(image)
+    painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+    pen = QPen(COLORS[0])
+    pen.setWidth(screen_drawer.PEN_WIDTH)
+    painter.setPen(pen)
+    rng = random.Random(0)
+    points = [
+        (QPoint(rng.randrange(1920), rng.randrange(1080)), QPoint(960, 540))
+        for _ in range(calls)
+    ]
+
+    def draw():
+        for start, end in points:
+            window.transparent_widget.draw_arrow(painter, start, end)
+
+    samples = [sample / calls for sample in timed(draw, repeat)]
+    painter.end()
+    window.close()
+    return [summarize("draw_arrow", samples, calls=calls)]
+
+
+def bench_shapes(screen_drawer, shapes, sizes, repeat):
+    """Repaints of a screen full of fading shapes and labels.
+
+    Shapes and labels are drawn from the paths and QStaticText built when
+    they were committed; label_draw_text lays the same text out on every
+    call, as painter.drawText() would, for comparison.
+    """
+    results = []
+    kinds = shapes.SHAPE_KINDS
+    for count in sizes:
+        count = min(count, 2000)  # Far more than fit legibly on a screen
+        window = make_window(screen_drawer)
+        widget = window.transparent_widget
+        window.dissolve_shapes = True
+        window.current_lifetime = 10**9  # Fading, but never gone mid-run
+        rng = random.Random(0)
+        for i in range(count):
+            x = rng.randrange(window.width() - 200)
+            y = rng.randrange(window.height() - 100)
+            color = COLORS[i % len(COLORS)]
+            kind = kinds[i % len(kinds)]
+            if kind == "text":
+                window.label_prompt = lambda i=i: f"Label {i}"
+                window.place_label(QPoint(x, y), color)
+            else:
+                window.add_shape(kind, QRect(x, y, 150, 80), color)
+        samples = timed(widget.repaint, repeat)
+        results.append(summarize("paint_dissolving_shapes", samples, shapes=count))
+
+        # The same shapes made permanent are rasterized into the arrow layer
+        window.shapes = list(window.dissolving_shapes)
+        for shape in window.shapes:
+            shape.lifetime = 0
+        window.dissolving_shapes.clear()
+        widget.invalidate_arrow_layer()
+        samples = timed(widget.repaint, 1)
+        results.append(summarize("paint_shape_layer_build", samples, shapes=count))
+        window.close()
+
+    image = QImage(1920, 1080, QImage.Format.Format_ARGB32_Premultiplied)
+    image.fill(Qt.GlobalColor.transparent)
+    painter = QPainter(image)
+    painter.setFont(shapes.label_font())
+    labels = [
+        shapes.make_label(i, f"Label {i}", 0xFFFF0000, 10, 10) for i in range(200)
+    ]
+
+    def draw_static():
+        for label in labels:
+            painter.drawStaticText(label.rect.topLeft(), label.static_text)
+
+    def draw_text():
+        for label in labels:
+            painter.drawText(label.rect.topLeft(), label.static_text.text())
+
+    for name, draw in (
+        ("label_draw_static", draw_static),
+        ("label_draw_text", draw_text),
+    ):
+        samples = [sample / len(labels) for sample in timed(draw, repeat)]
+        results.append(summarize(name, samples, calls=len(labels)))
+    painter.end()
+    return results
+
+
+class RemapCounter(QObject):
+    """Count hide, show and expose events, each a sign of a remapped window."""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def eventFilter(self, watched, event):
+        if event.type() in (QEvent.Type.Hide, QEvent.Type.Show, QEvent.Type.Expose):
+            self.count += 1
+        return False
+
+
+def bench_toggle(screen_drawer, repeat):
+    """Drawing mode toggles after the first, which builds the toolbar."""
+    window = make_window(screen_drawer)
+    window.toggle_drawing_mode()
+    window.toggle_drawing_mode()
+    QApplication.processEvents()
+    counter = RemapCounter()
+    window.installEventFilter(counter)
+    window.windowHandle().installEventFilter(counter)
+
+    def toggle():
+        window.toggle_drawing_mode()
+        QApplication.processEvents()
+
+    samples = timed(toggle, repeat * 2)
+    result = summarize("toggle_drawing_mode", samples)
+    # One frame at the screen's refresh rate is the budget for a toggle
+    result["frame_budget_ms"] = 1000 / (window.screen().refreshRate() or 60)
+    result["within_budget"] = result["p95"] < result["frame_budget_ms"]
+    result["window_remap_events"] = counter.count
+    window.close()
+    return [result]
+
+
+def bench_idle(screen_drawer, repeat):
+    """Toggles in and out of idle mode, and the area left mapped while idle."""
+    window = make_window(screen_drawer, idle=True)
+    window.toggle_drawing_mode()
+    window.toggle_drawing_mode()
+    QApplication.processEvents()
+    counter = RemapCounter()
+    window.installEventFilter(counter)
+
+    def toggle():
+        window.toggle_drawing_mode()
+        QApplication.processEvents()
+
+    # An empty overlay is unmapped on leaving drawing mode and mapped on entering
+    samples = timed(toggle, repeat * 2)
+    result = summarize("toggle_from_idle", samples)
+    result["window_remap_events"] = counter.count
+    result["hidden_when_idle"] = not window.isVisible()
+
+    # A callout of a few arrows keeps it mapped, masked to the area they cover
+    window.add_arrows([(100 + 40 * i, 100, 300, 300) for i in range(10)])
+    QApplication.processEvents()
+    area = window.idle_bounds.width() * window.idle_bounds.height()
+    coverage = {
+        "name": "idle_mapped_area",
+        "params": {"arrows": 10},
+        "unit": "fraction",
+        "value": area / (window.width() * window.height()),
+    }
+    window.close()
+    return [result, coverage]
+
+
+STARTUP_SCRIPT = """
+import json, sys, time
+import screen_drawer
+from PyQt6.QtWidgets import QApplication
+app, window, keyboard_manager = screen_drawer.start(sys.argv[:1])
+QApplication.processEvents()
+start = time.perf_counter()
+window.toggle_drawing_mode()
+QApplication.processEvents()
+timings = dict(screen_drawer.STARTUP_TIMINGS)
+timings["first_toggle"] = (time.perf_counter() - start) * 1000
+print(json.dumps(timings))
+"""
+
+
+def bench_startup(repeat):
+    """Cold start in a fresh interpreter, with a Python -X importtime breakdown."""
+    env = dict(
+        os.environ,
+        QT_QPA_PLATFORM="offscreen",
+        ARROWS_HOTKEY_BACKEND="none",
+        ARROWS_SESSION="off",
+    )
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_SCRIPT],
+            capture_output=True,
+            text=True,
+            env=env,
+            cwd=cwd,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.splitlines()[-1]))
+    results = [
+        summarize(f"startup_{step}", [run[step] / 1000 for run in runs])
+        for step in runs[0]
+    ]
+
+    # Each importtime line is "import time: self | cumulative | package"
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import screen_drawer"],
+        capture_output=True,
+        text=True,
+        env=env,
+        cwd=cwd,
+        check=True,
+    ).stderr
+    imports = []
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        # Nested imports are indented two spaces per level; keep the modules
+        # screen_drawer imports directly, plus screen_drawer itself
+        name = fields[2][1:]
+        if len(name) - len(name.lstrip()) <= 2:
+            imports.append((int(fields[1]), name.strip()))
+    results.append(
+        {
+            "name": "import_time",
+            "params": {},
+            "unit": "us",
+            "modules": {
+                name: cumulative for cumulative, name in sorted(imports, reverse=True)
+            },
+        }
+    )
+    return results
+
+
+def bench_hotkey(keyboard_manager, repeat, keystrokes=10000):
+    """Per-keystroke cost of hotkey matching for ordinary typing.
+
+    With the X11 grab backend ordinary keystrokes never reach the process,
+    so only the listener-based paths have a per-keystroke cost to measure.
+    """
+    rng = random.Random(0)
+    typing = [rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(keystrokes)]
+    results = []
+
+    matcher = keyboard_manager.HotkeyMatcher(keyboard_manager.DEFAULT_BINDINGS)
+
+    def type_matcher():
+        for key in typing:
+            matcher.press(key)
+            matcher.release(key)
+
+    samples = [sample / keystrokes for sample in timed(type_matcher, repeat)]
+    results.append(summarize("hotkey_keystroke", samples, backend="matcher"))
+
+    try:
+        from pynput import keyboard
+    except Exception:
+        return results  # pynput needs a display server to import
+
+    # The previous design: a pynput HotKey fed through listener.canonical
+    listener = keyboard.Listener()
+    hotkey = keyboard.HotKey(
+        keyboard.HotKey.parse(keyboard_manager.DEFAULT_BINDINGS["toggle"]),
+        lambda: None,
+    )
+    codes = [keyboard.KeyCode.from_char(key) for key in typing]
+
+    def type_pynput_hotkey():
+        for code in codes:
+            hotkey.press(listener.canonical(code))
+            hotkey.release(listener.canonical(code))
+
+    samples = [sample / keystrokes for sample in timed(type_pynput_hotkey, repeat)]
+    results.append(summarize("hotkey_keystroke", samples, backend="pynput_hotkey"))
+
+    backend = keyboard_manager.PynputBackend(
+        keyboard_manager.DEFAULT_BINDINGS, lambda action: None
+    )
+
+    def type_pynput_backend():
+        for code in codes:
+            backend.on_press(code)
+            backend.on_release(code)
+
+    samples = [sample / keystrokes for sample in timed(type_pynput_backend, repeat)]
+    results.append(summarize("hotkey_keystroke", samples, backend="pynput"))
+    return results
+
+
+def bench_memory(arrow_store, sizes):
+    results = []
+    for count in sizes:
+        store = arrow_store.ArrowStore()
+        for i in range(count):
+            store.append(i, i, i + 10, i + 10, 0xFFFF0000, i)
+        results.append(
+            {
+                "name": "arrow_store_memory",
+                "params": {"arrows": count},
+                "unit": "bytes",
+                "total": store.memory_usage(),
+                "per_arrow": store.memory_usage() / count,
+            }
+        )
+    return results
+
+
+def wait_until(condition, timeout=10):
+    """Process events until condition() holds; return the seconds it took."""
+    start = time.perf_counter()
+    while not condition():
+        QApplication.processEvents()
+        if time.perf_counter() - start > timeout:
+            raise RuntimeError("timed out waiting for the subscriber")
+    return time.perf_counter() - start
+
+
+def bench_sync(screen_drawer, sizes, repeat):
+    """Publisher to subscriber over localhost: join cost, latency and bytes."""
+    results = []
+    for count in sizes:
+        publisher = make_window(screen_drawer)
+        subscriber = make_window(screen_drawer)
+        populate(publisher, count)
+        sync = publisher.start_sync("publish", "127.0.0.1:0")
+        start = time.perf_counter()
+        mirror = subscriber.start_sync("subscribe", f"127.0.0.1:{sync.port}")
+        wait_until(lambda: len(subscriber.arrows) == count)
+        results.append(
+            summarize("sync_join", [time.perf_counter() - start], arrows=count)
+        )
+        snapshot_bytes = sync.bytes_sent
+
+        # Each arrow is flushed and applied before the next one is drawn
+        samples = []
+        for i in range(repeat):
+            expected = len(subscriber.arrows) + 1
+            start = time.perf_counter()
+            publisher.add_arrow(
+                QPoint(10 + i, 10), QPoint(200, 100 + i), COLORS[0], False
+            )
+            wait_until(lambda: len(subscriber.arrows) == expected)
+            samples.append(time.perf_counter() - start)
+        results.append(summarize("sync_latency", samples, arrows=count))
+        results.append(
+            {
+                "name": "sync_bytes",
+                "params": {"arrows": count},
+                "unit": "bytes",
+                "snapshot_per_arrow": snapshot_bytes / max(1, count),
+                "per_change": (sync.bytes_sent - snapshot_bytes) / repeat,
+            }
+        )
+        mirror.close()
+        sync.close()
+        publisher.close()
+        subscriber.close()
+    return results
+
+
+def synthetic_recording(path, seconds, width=1280, height=720, seed=0):
+    """Write a recording of random arrows, dissolving arrows and pen strokes."""
+    import recording
+
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        header = {
+            "format": recording.FORMAT,
+            "version": recording.VERSION,
+            "width": width,
+            "height": height,
+            "tool": "normal",
+            "color": COLORS[0].rgba(),
+            "lifetime": 2000,
+            "drawing_mode": True,
+        }
+        f.write(json.dumps(header) + "\n")
+        t = 0
+        while t < seconds * 1000:
+            t += rng.randint(200, 1500)
+            f.write(
+                json.dumps([t, "tool", rng.choice(("normal", "dissolving", "pen"))])
+            )
+            x, y = rng.randrange(width), rng.randrange(height)
+            f.write("\n" + json.dumps([t, "press", x, y]) + "\n")
+            for _ in range(rng.randint(10, 60)):
+                t += 8
+                x, y = x + rng.randint(-3, 8), y + rng.randint(-3, 8)
+                f.write(json.dumps([t, "move", x, y]) + "\n")
+            f.write(json.dumps([t, "release", x, y]) + "\n")
+
+
+def bench_render_recording(seconds=20, fps=30):
+    """Export a synthetic recording to PNGs, serially and with every CPU."""
+    import recording
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "session.jsonl")
+        synthetic_recording(path, seconds)
+        for jobs in sorted({1, os.cpu_count() or 1}):
+            output = os.path.join(directory, f"frames-{jobs}")
+            start = time.perf_counter()
+            frames = recording.render(path, output, fps, jobs)
+            elapsed = time.perf_counter() - start
+            results.append(
+                {
+                    "name": "render_recording",
+                    "params": {"seconds": seconds, "fps": fps, "jobs": jobs},
+                    "unit": "ms",
+                    "total": elapsed * 1000,
+                    "per_frame": elapsed * 1000 / frames,
+                    "fraction_of_real_time": elapsed / seconds,
+                }
+            )
+    return results
+
+
+def bench_journal(arrow_store, journal, sizes, repeat):
+    """GUI-thread cost of journaling an arrow, and session load time."""
+    results = []
+    for count in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "session.journal")
+            store = arrow_store.ArrowStore()
+            log = journal.Journal(path, store)
+
+            def add_arrows():
+                for i in range(count):
+                    arrow_id = store.append(i, i, i + 10, i + 10, 0xFFFF0000, i)
+                    log.append(arrow_id)
+
+            samples = [sample / count for sample in timed(add_arrows, 1)]
+            results.append(summarize("journal_append", samples, arrows=count))
+            log.close()
+
+            samples = timed(
+                lambda: journal.replay(path, arrow_store.ArrowStore()), repeat
+            )
+            results.append(summarize("journal_replay", samples, arrows=count))
+    return results
+
+
+def check_dissolve_reinsert(screen_drawer, animation):
+    """Put dissolving arrows back through undo/redo and moves, then expire
+    one and check the tick removes exactly that arrow."""
+    start = animation.now_ms()
+    offset = [0]
+    animation.use_clock(lambda: start + offset[0])
+    window = make_window(screen_drawer)
+    store = window.dissolving_arrows
+    (short,) = window.add_arrows([(10, 10, 200, 10)], dissolving=True, lifetime=1000)
+    (long,) = window.add_arrows([(10, 50, 200, 50)], dissolving=True, lifetime=60000)
+    window.undo()
+    window.redo()
+    window.apply_command(("move", store, short, 5, 5))
+    window.apply_command(window.apply_command(("erase", store, short)))
+
+    offset[0] = 1500
+    window.update_dissolving_arrows()
+    left = window.dissolving_index.query_rect(0, 0, window.width(), window.height())
+    if list(store.id) != [long] or left != {long}:
+        raise AssertionError(f"expected only arrow {long}, kept {list(store.id)}")
+
+    offset[0] = 61000
+    window.update_dissolving_arrows()
+    if len(store) or window.fade_scheduler.is_running():
+        raise AssertionError("dissolving arrows left after their lifetime")
+    window.close()
+
+
+def frame_mask(image, rect, threshold=128):
+    """Return a set of the (x, y) in rect where image is at least threshold opaque."""
+    image = image.convertToFormat(QImage.Format.Format_Alpha8).copy(rect)
+    stride = image.bytesPerLine()
+    bits = bytes(image.constBits().asstring(stride * image.height()))
+    return {
+        (x, y)
+        for y in range(image.height())
+        for x in range(image.width())
+        if bits[y * stride + x] >= threshold
+    }
+
+
+def check_gl_frame(screen_drawer, animation, tolerance=1, max_mismatch=0.01):
+    """Draw one scene with the raster and the OpenGL widget and compare.
+
+    Pixels covered in one frame must be covered in the other within
+    tolerance pixels, which absorbs the different antialiasing. Needs an
+    OpenGL 4.1 context, see the module docstring.
+    """
+    from gl_renderer import opengl_available
+
+    if not opengl_available():
+        raise RuntimeError("No OpenGL 4.1 context, run under xvfb-run with llvmpipe")
+    start = animation.now_ms()
+    offset = [0]
+    animation.use_clock(lambda: start + offset[0])
+    rect = QRect(0, 0, 480, 360)
+    masks = {}
+    for renderer in ("raster", "opengl"):
+        os.environ["ARROWS_RENDERER"] = renderer
+        screen_drawer.widget_class.cache_clear()
+        window = make_window(screen_drawer)
+        widget = window.transparent_widget
+        window.add_arrows(
+            [(40, 40, 300, 120), (420, 60, 200, 300), (100, 320, 100, 320)],
+            color=COLORS[0],
+        )
+        window.add_arrows([(60, 200, 400, 200)], color=COLORS[1])
+        window.add_arrows(
+            [(300, 300, 460, 180)], color=COLORS[2], dissolving=True, lifetime=4000
+        )
+        offset[0] = 1000  # The dissolving arrow is drawn at 3/4 opacity
+        widget.update()
+        QApplication.processEvents()
+        if renderer == "opengl":
+            if widget.renderer is None:
+                raise AssertionError("the OpenGL renderer did not start")
+            frame = widget.grabFramebuffer()
+        else:
+            frame = widget.grab().toImage()
+        masks[renderer] = frame_mask(frame, rect)
+        window.close()
+
+    def missing(mask, other):
+        near = {
+            (x + dx, y + dy)
+            for x, y in other
+            for dx in range(-tolerance, tolerance + 1)
+            for dy in range(-tolerance, tolerance + 1)
+        }
+        return len(mask - near)
+
+    raster, opengl = masks["raster"], masks["opengl"]
+    mismatch = (missing(raster, opengl) + missing(opengl, raster)) / max(
+        1, len(raster | opengl)
+    )
+    if not raster or mismatch > max_mismatch:
+        raise AssertionError(
+            f"OpenGL frame differs from the raster one: {mismatch:.1%} of "
+            f"{len(raster)} raster and {len(opengl)} OpenGL pixels"
+        )
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--output", help="write JSON results to this file")
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=list(DEFAULT_SIZES),
+        help="comma-separated arrow counts (default: %(default)s)",
+    )
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument(
+        "--renderer",
+        choices=("raster", "opengl"),
+        default="raster",
+        help="overlay renderer to benchmark (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="run the correctness checks instead of the benchmarks",
+    )
+    args = parser.parse_args()
+    os.environ["ARROWS_RENDERER"] = args.renderer
+
+    app = QApplication(sys.argv[:1])
+    if args.check:
+        import animation
+        import screen_drawer
+
+        check_dissolve_reinsert(screen_drawer, animation)
+        if args.renderer == "opengl":
+            check_gl_frame(screen_drawer, animation)
+        print("checks passed")
+        return
+
+    import arrow_store
+    import journal
+    import keyboard_manager
+    import screen_drawer
+    import shapes
+
+    results = []
+    results += bench_paint(screen_drawer, args.sizes, args.repeat)
+    results += bench_mouse_stream(screen_drawer, args.sizes, max(1, args.repeat // 5))
+    results += bench_bulk_insert(screen_drawer, args.sizes, args.repeat)
+    results += bench_dissolve(screen_drawer, args.sizes, args.repeat)
+    results += bench_draw_arrow(screen_drawer, max(1, args.repeat // 5))
+    results += bench_shapes(screen_drawer, shapes, args.sizes, args.repeat)
+    results += bench_toggle(screen_drawer, args.repeat)
+    results += bench_idle(screen_drawer, args.repeat)
+    results += bench_hotkey(keyboard_manager, args.repeat)
+    results += bench_startup(max(1, args.repeat // 5))
+    results += bench_memory(arrow_store, args.sizes)
+    results += bench_journal(arrow_store, journal, args.sizes, args.repeat)
+    results += bench_sync(screen_drawer, args.sizes, args.repeat)
+    results += bench_render_recording()
+
+    report = {
+        "meta": {
+            "commit": git_revision(),
+            "python": platform.python_version(),
+            "qt": QT_VERSION_STR,
+            "platform": platform.platform(),
+            "qpa": app.platformName(),
+            "renderer": args.renderer,
+            "timestamp": time.time(),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import heapq
+
+
+class ExpiryQueue:
+    """Min-heap of (expiry time, arrow id) for arrows with a lifetime.
+
+    Pushing and popping cost O(log n), so a tick only touches the arrows
+    that actually expire. Entries are never removed early: an arrow erased,
+    moved or restored meanwhile leaves a stale entry behind, and callers
+    check each popped id against the store before acting on it.
+    """
+
+    def __init__(self):
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def clear(self):
+        self.heap.clear()
+
+    def push(self, expires, arrow_id):
+        heapq.heappush(self.heap, (expires, arrow_id))
+
+    def next_expiry(self):
+        """Return the earliest expiry time queued, or None."""
+        return self.heap[0][0] if self.heap else None
+
+    def pop_expired(self, now):
+        """Pop and return the ids of every entry due at or before now.
+
+        An arrow put back with its original lifetime has a second entry with
+        the same expiry time, so each id is returned once.
+        """
+        heap = self.heap
+        expired = []
+        while heap and heap[0][0] <= now:
+            expired.append(heapq.heappop(heap)[1])
+        return list(dict.fromkeys(expired))
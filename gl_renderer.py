@@ -0,0 +1,225 @@
+from array import array
+from PyQt6.QtGui import QMatrix4x4, QOpenGLContext, QSurfaceFormat
+from PyQt6.QtOpenGL import (
+    QOpenGLBuffer,
+    QOpenGLShader,
+    QOpenGLShaderProgram,
+    QOpenGLVersionFunctionsFactory,
+    QOpenGLVersionProfile,
+    QOpenGLVertexArrayObject,
+)
+
+GL_COLOR_BUFFER_BIT = 0x4000
+GL_BLEND = 0x0BE2
+GL_MULTISAMPLE = 0x809D
+GL_ONE = 1
+GL_ONE_MINUS_SRC_ALPHA = 0x0303
+GL_TRIANGLES = 0x0004
+GL_UNSIGNED_BYTE = 0x1401
+GL_FLOAT = 0x1406
+
+GL_VERSION = (4, 1)  # Core profile with instancing, also available on llvmpipe
+VERTICES_PER_ARROW = 18  # Shaft and two head barbs, two triangles each
+
+# ArrowStore columns uploaded as one float attribute each
+COORDINATES = ("x1", "y1", "x2", "y2", "hx1", "hy1", "hx2", "hy2")
+
+# Each arrow is one instance. The shader expands vertex n into corner n % 6
+# of a quad around segment n / 6, so no per-vertex data is uploaded at all.
+VERTEX_SHADER = """
+#version 330 core
+in float x1; in float y1; in float x2; in float y2;
+in float hx1; in float hy1; in float hx2; in float hy2;
+in vec4 color;  // Packed ARGB bytes, read as (b, g, r, a)
+in float created;
+in float lifetime;  // 0 for arrows that never fade
+uniform mat4 matrix;
+uniform float now;
+uniform float half_width;
+out vec4 v_color;
+
+void main() {
+    int segment = gl_VertexID / 6;
+    int corner = gl_VertexID % 6;
+    vec2 a = vec2(x2, y2);
+    vec2 b = segment == 0 ? vec2(x1, y1) : (segment == 1 ? vec2(hx1, hy1) : vec2(hx2, hy2));
+    vec2 direction = b - a;
+    float len = length(direction);
+    direction = len > 0.0 ? direction / len : vec2(1.0, 0.0);
+    vec2 along = direction * half_width;
+    vec2 normal = vec2(-direction.y, direction.x) * half_width;
+    bool at_b = corner == 1 || corner == 2 || corner == 4;
+    float side = (corner == 2 || corner == 4 || corner == 5) ? 1.0 : -1.0;
+    vec2 position = (at_b ? b + along : a - along) + normal * side;
+
+    float alpha = lifetime > 0.0 ? clamp(1.0 - (now - created) / lifetime, 0.0, 1.0) : 1.0;
+    v_color = vec4(color.zyx, color.w * alpha);
+    gl_Position = matrix * vec4(position, 0.0, 1.0);
+}
+"""
+
+FRAGMENT_SHADER = """
+#version 330 core
+in vec4 v_color;
+out vec4 fragment;
+
+void main() {
+    fragment = vec4(v_color.rgb * v_color.a, v_color.a);  // Premultiplied
+}
+"""
+
+
+def surface_format():
+    fmt = QSurfaceFormat()
+    fmt.setVersion(*GL_VERSION)
+    fmt.setProfile(QSurfaceFormat.OpenGLContextProfile.CoreProfile)
+    fmt.setAlphaBufferSize(8)
+    fmt.setSamples(4)
+    return fmt
+
+
+def opengl_available():
+    """Return whether a context of the version the renderer needs can be made."""
+    context = QOpenGLContext()
+    context.setFormat(surface_format())
+    if not context.create():
+        return False
+    version = context.format().version()
+    return (version[0], version[1]) >= GL_VERSION
+
+
+class StoreBuffers:
+    """Instance buffers mirroring the columns of one ArrowStore."""
+
+    def __init__(self, program, functions, fade):
+        self.fade = fade  # Whether created/lifetime are uploaded per arrow
+        self.version = None
+        self.count = 0
+        self.capacity = 0
+        self.time_base = 0
+        self.vao = QOpenGLVertexArrayObject()
+        if not self.vao.create():
+            raise RuntimeError("Could not create a vertex array object")
+        self.vao.bind()
+        self.buffers = {}
+        names = COORDINATES + ("rgba",) + (("created", "lifetime") if fade else ())
+        for name in names:
+            buffer = QOpenGLBuffer(QOpenGLBuffer.Type.VertexBuffer)
+            if not buffer.create():
+                raise RuntimeError(f"Could not create the {name} buffer")
+            buffer.setUsagePattern(QOpenGLBuffer.UsagePattern.DynamicDraw)
+            buffer.bind()
+            attribute = "color" if name == "rgba" else name
+            location = program.attributeLocation(attribute)
+            if name == "rgba":
+                program.setAttributeBuffer(location, GL_UNSIGNED_BYTE, 0, 4)
+            else:
+                program.setAttributeBuffer(location, GL_FLOAT, 0, 1)
+            program.enableAttributeArray(location)
+            functions.glVertexAttribDivisor(location, 1)
+            self.buffers[name] = buffer
+        self.vao.release()
+
+    def columns(self, store, start):
+        """Yield (name, bytes) of the store's columns from row start on."""
+        for name in COORDINATES:
+            yield name, array("f", getattr(store, name)[start:]).tobytes()
+        yield "rgba", store.rgba[start:].tobytes()
+        if self.fade:
+            base = self.time_base
+            yield "created", array(
+                "f", [c - base for c in store.created[start:]]
+            ).tobytes()
+            yield "lifetime", array("f", store.lifetime[start:]).tobytes()
+
+    def sync(self, store, append_only=False):
+        """Upload what changed in the store since the last sync.
+
+        With append_only, rows already uploaded are known to be unchanged
+        and only the new ones are written.
+        """
+        if store.version == self.version:
+            return
+        count = len(store)
+        start = self.count if append_only and count >= self.count else 0
+        if count > self.capacity:
+            # Grow geometrically so a stream of appends reallocates rarely
+            self.capacity = max(1024, count * 2)
+            start = 0
+            for name, buffer in self.buffers.items():
+                buffer.bind()
+                buffer.allocate(self.capacity * 4)
+        if start == 0 and self.fade and store.created:
+            self.time_base = min(store.created)
+        for name, data in self.columns(store, start):
+            buffer = self.buffers[name]
+            buffer.bind()
+            buffer.write(start * 4, data, (count - start) * 4)
+        self.count = count
+        self.version = store.version
+
+
+class ArrowRenderer:
+    """Draws every committed arrow with one instanced draw call per store.
+
+    Arrow columns are uploaded to vertex buffers only when the store
+    changes, and dissolving arrows fade in the vertex shader from their
+    creation time and lifetime, so an animation frame uploads nothing.
+    """
+
+    def __init__(self, context, pen_width):
+        self.half_width = pen_width / 2
+        self.functions = QOpenGLVersionFunctionsFactory.get(
+            QOpenGLVersionProfile(surface_format()), context
+        )
+        if self.functions is None:
+            raise RuntimeError("OpenGL 4.1 core functions are unavailable")
+        self.program = QOpenGLShaderProgram()
+        compiled = self.program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Vertex, VERTEX_SHADER
+        ) and self.program.addShaderFromSourceCode(
+            QOpenGLShader.ShaderTypeBit.Fragment, FRAGMENT_SHADER
+        )
+        if not compiled or not self.program.link():
+            raise RuntimeError(f"Arrow shader failed: {self.program.log()}")
+        self.program.bind()
+        self.static = StoreBuffers(self.program, self.functions, fade=False)
+        self.dissolving = StoreBuffers(self.program, self.functions, fade=True)
+        self.program.release()
+
+    def draw(
+        self, width, height, background, arrows, dissolving_arrows, now, append_only
+    ):
+        f = self.functions
+        f.glClearColor(background, background, background, background)
+        f.glClear(GL_COLOR_BUFFER_BIT)
+        f.glEnable(GL_BLEND)
+        f.glEnable(GL_MULTISAMPLE)
+        f.glBlendFunc(GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+
+        matrix = QMatrix4x4()
+        matrix.ortho(0, width, height, 0, -1, 1)
+        self.program.bind()
+        self.program.setUniformValue("matrix", matrix)
+        self.program.setUniformValue("half_width", float(self.half_width))
+
+        # Normal arrows never fade; their fade inputs are constant attributes
+        self.static.sync(arrows, append_only)
+        self.static.vao.bind()
+        self.program.setAttributeValue("created", 0.0)
+        self.program.setAttributeValue("lifetime", 0.0)
+        if self.static.count:
+            f.glDrawArraysInstanced(
+                GL_TRIANGLES, 0, VERTICES_PER_ARROW, self.static.count
+            )
+        self.static.vao.release()
+
+        self.dissolving.sync(dissolving_arrows)
+        if self.dissolving.count:
+            self.dissolving.vao.bind()
+            self.program.setUniformValue("now", float(now - self.dissolving.time_base))
+            f.glDrawArraysInstanced(
+                GL_TRIANGLES, 0, VERTICES_PER_ARROW, self.dissolving.count
+            )
+            self.dissolving.vao.release()
+        self.program.release()
@@ -0,0 +1,42 @@
+from collections import deque
+
+DEFAULT_LIMIT = 1000  # Steps kept in each direction
+
+
+class History:
+    """Bounded undo/redo log of edit commands.
+
+    A command is a small tuple naming an edit and the arrow id (or single
+    row) it applies to, never a copy of the arrow list. Applying a command
+    returns the command that reverses it, or None if its target no longer
+    exists, for instance a dissolving arrow that has since expired; such
+    stale commands are dropped and the next one is tried.
+    """
+
+    def __init__(self, apply, limit=DEFAULT_LIMIT):
+        self.apply = apply
+        self.undo_stack = deque(maxlen=limit)
+        self.redo_stack = deque(maxlen=limit)
+
+    def record(self, command):
+        """Remember the command that reverses an edit just made."""
+        self.undo_stack.append(command)
+        self.redo_stack.clear()
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
+    def undo(self):
+        return self.step(self.undo_stack, self.redo_stack)
+
+    def redo(self):
+        return self.step(self.redo_stack, self.undo_stack)
+
+    def step(self, source, target):
+        while source:
+            inverse = self.apply(source.pop())
+            if inverse is not None:
+                target.append(inverse)
+                return True
+        return False
@@ -0,0 +1,205 @@
+import mmap
+import os
+import queue
+import struct
+import sys
+import threading
+from array import array
+from arrow_store import COLUMNS
+
+MAGIC = b"ARRJ"
+VERSION = 2
+HEADER = struct.Struct("<4sHHQ")  # magic, version, record size, snapshot arrows
+
+# op, kind, reserved, arrow id, x1, y1, x2, y2, hx1, hy1, hx2, hy2, rgba, created,
+# lifetime
+RECORD = struct.Struct("<BBHQiiiiiiiiIqI")
+
+OP_ADD = 1
+OP_REMOVE = 2
+
+COMPACT_MIN_RECORDS = 4096  # Never compact for fewer records than this
+COMPACT_RATIO = 4  # Compact once records exceed 1/COMPACT_RATIO of the arrows
+
+
+def replay(path, store):
+    """Load the journal at path into an empty ArrowStore.
+
+    The file starts with a snapshot holding each ArrowStore column as raw
+    little-endian array bytes, read straight out of the mapped file, and
+    continues with fixed-size records of the changes made since. Returns
+    the size of the valid part of the file; a torn record at the end, left
+    by a crash mid-write, is not part of it.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return 0
+    with f:
+        size = os.fstat(f.fileno()).st_size
+        if size < HEADER.size:
+            return 0
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            magic, version, record_size, count = HEADER.unpack_from(mapped)
+            if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                print(f"Ignoring session journal with unknown format: {path}")
+                return 0
+            with memoryview(mapped) as view:
+                offset = HEADER.size
+                for name, typecode in COLUMNS:
+                    column = array(typecode)
+                    end = offset + count * column.itemsize
+                    column.frombytes(view[offset:end])
+                    if sys.byteorder == "big":
+                        column.byteswap()
+                    setattr(store, name, column)
+                    offset = end
+                end = size - (size - offset) % RECORD.size
+                last_id = store.id[-1] if store.id else -1
+                appended = []  # Runs of new arrows are appended in bulk
+                for record in RECORD.iter_unpack(view[offset:end]):
+                    arrow_id = record[3]
+                    if record[0] == OP_ADD and arrow_id > last_id:
+                        appended.append(record[4:] + (record[1], arrow_id))
+                        last_id = arrow_id
+                        continue
+                    store.extend(appended)
+                    appended = []
+                    if store.index_of(arrow_id) is not None:
+                        store.remove(arrow_id)  # Moved arrows are added again
+                    if record[0] == OP_ADD:
+                        store.insert(record[4:] + (record[1], arrow_id))
+                store.extend(appended)
+    store.next_id = store.id[-1] + 1 if store.id else 0
+    store.version += 1
+    return end
+
+
+class Journal:
+    """Append-only log of the changes made to an ArrowStore.
+
+    The GUI thread only packs records and queues them; a writer thread
+    appends them to the file and fsyncs once per batch. Once the records
+    outgrow a fraction of the arrows, and again on close, the columns are
+    copied into a new snapshot that the writer swaps in atomically, so a
+    replay only ever decodes a short tail of records.
+    """
+
+    def __init__(self, path, store, valid_size=0):
+        """Journal store to path, which replay() read valid_size bytes of."""
+        self.path = path
+        self.store = store
+        self.records = 0  # Records written since the last snapshot
+        self.queue = queue.SimpleQueue()
+        self.thread = threading.Thread(
+            target=self.run, name="arrows-journal", daemon=True
+        )
+        self.thread.start()
+        if valid_size:
+            self.queue.put(("truncate", valid_size))
+        else:
+            self.compact()
+
+    def append(self, arrow_id):
+        """Record an arrow added to, or put back into, the store."""
+        self.write(self.pack_add(arrow_id))
+
+    def append_many(self, arrow_ids):
+        """Record several added arrows as a single queued write."""
+        self.write(b"".join(map(self.pack_add, arrow_ids)), len(arrow_ids))
+
+    def pack_add(self, arrow_id):
+        store = self.store
+        i = store.index_of(arrow_id)
+        return RECORD.pack(
+            OP_ADD,
+            store.kind[i],
+            0,
+            arrow_id,
+            store.x1[i],
+            store.y1[i],
+            store.x2[i],
+            store.y2[i],
+            store.hx1[i],
+            store.hy1[i],
+            store.hx2[i],
+            store.hy2[i],
+            store.rgba[i],
+            store.created[i],
+            store.lifetime[i],
+        )
+
+    def remove(self, arrow_id):
+        self.write(RECORD.pack(OP_REMOVE, 0, 0, arrow_id, *[0] * 11))
+
+    def write(self, record, count=1):
+        self.queue.put(("write", record))
+        self.records += count
+        if self.records > COMPACT_MIN_RECORDS and self.records * COMPACT_RATIO > len(
+            self.store
+        ):
+            self.compact()
+
+    def compact(self):
+        """Replace the file with a snapshot of the store as it is now."""
+        columns = [bytes(getattr(self.store, name)) for name, _ in COLUMNS]
+        self.queue.put(("snapshot", columns, len(self.store)))
+        self.records = 0
+
+    def close(self):
+        """Write a final snapshot and stop the writer thread."""
+        self.compact()
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        f = None
+        while True:
+            batch = [self.queue.get()]
+            try:
+                while True:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            records = []
+            for task in batch:
+                if task is None:
+                    break
+                if task[0] == "write":
+                    records.append(task[1])
+                    continue
+                if records:
+                    f.write(b"".join(records))
+                    records = []
+                if f is not None:
+                    f.close()
+                if task[0] == "snapshot":
+                    f = self.write_snapshot(task[1], task[2])
+                else:
+                    f = open(self.path, "r+b")
+                    f.truncate(task[1])
+                    f.seek(task[1])
+            if records:
+                f.write(b"".join(records))
+            f.flush()
+            os.fsync(f.fileno())
+            if None in batch:
+                f.close()
+                return
+
+    def write_snapshot(self, columns, count):
+        """Atomically replace the journal with a snapshot and reopen it."""
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, count))
+            for (_, typecode), data in zip(COLUMNS, columns):
+                if sys.byteorder == "big":
+                    column = array(typecode, data)
+                    column.byteswap()
+                    data = column.tobytes()
+                f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        return open(self.path, "ab")
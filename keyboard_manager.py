@@ -1,30 +1,262 @@
-from pynput import keyboard
-from PyQt6.QtCore import QObject, pyqtSignal
+import os
+import select
+import threading
+from PyQt6.QtCore import QObject, Qt, pyqtSignal
+
+# Default global bindings, in pynput's hotkey syntax
+DEFAULT_BINDINGS = {
+    'toggle': '<ctrl>+<alt>+<shift>+d',
+    'clear': '<ctrl>+<alt>+<shift>+c',
+    'arrow_normal': '<ctrl>+<alt>+<shift>+n',
+    'arrow_dissolving': '<ctrl>+<alt>+<shift>+f',
+}
+
+
+def parse_hotkey(combo):
+    """Parse '<ctrl>+<alt>+d' into a frozenset of lower-case key names."""
+    keys = []
+    for part in combo.split('+'):
+        part = part.strip().lower()
+        if part.startswith('<') and part.endswith('>'):
+            part = part[1:-1]
+        if not part:
+            raise ValueError(f'Invalid hotkey: {combo!r}')
+        keys.append(part)
+    return frozenset(keys)
+
+
+class HotkeyMatcher:
+    """Match the set of currently pressed keys against several bindings.
+
+    One matcher serves every binding, so each keystroke costs a set update
+    and a dict lookup no matter how many hotkeys are configured.
+    """
+
+    def __init__(self, bindings, parse=parse_hotkey):
+        # parse turns a combo into the frozenset of keys press() is given
+        self.bindings = {parse(combo): action for action, combo in bindings.items()}
+        self.pressed = set()
+
+    def press(self, key):
+        """Register a key press and return the action it completes, if any."""
+        if key is None or key in self.pressed:
+            return None  # Ignore auto-repeat
+        self.pressed.add(key)
+        return self.bindings.get(frozenset(self.pressed))
+
+    def release(self, key):
+        self.pressed.discard(key)
+
+
+class PynputBackend:
+    """Portable backend: a pynput listener sees every key and runs the matcher.
+
+    Bindings and key events are both reduced to pynput's canonical keys,
+    so special keys such as <f9>, which canonicalize to a bare virtual key
+    code without a character, match like any other key.
+    """
+
+    name = 'pynput'
+
+    def __init__(self, bindings, callback):
+        from pynput import keyboard
+
+        self._keyboard = keyboard
+        self.callback = callback
+        self.listener = keyboard.Listener(
+            on_press=self.on_press, on_release=self.on_release
+        )
+        self.matcher = HotkeyMatcher(bindings, self.parse)
+
+    @staticmethod
+    def available():
+        try:
+            import pynput.keyboard  # noqa: F401
+        except Exception:
+            return False
+        return True
+
+    def parse(self, combo):
+        """Return the canonical pynput keys of a combo like '<ctrl>+<f9>'."""
+        return frozenset(
+            self.listener.canonical(key) for key in self._keyboard.HotKey.parse(combo)
+        )
+
+    def canonical(self, key):
+        """Return the canonical form of an event's key, folding left/right
+        variants and case; None for keys pynput could not identify."""
+        if key is None:
+            return None
+        return self.listener.canonical(key)
+
+    def on_press(self, key):
+        action = self.matcher.press(self.canonical(key))
+        if action is not None:
+            self.callback(action)
+
+    def on_release(self, key):
+        self.matcher.release(self.canonical(key))
+
+    def start(self):
+        self.listener.start()
+
+    def stop(self):
+        self.listener.stop()
+
+
+class X11GrabBackend:
+    """X11 backend: grab only the configured combos with XGrabKey.
+
+    The X server delivers nothing but the grabbed combos, so the listener
+    thread sleeps in select() and Python runs only when a hotkey fires.
+    """
+
+    name = 'x11'
+
+    def __init__(self, bindings, callback):
+        from Xlib import X, XK, display
+
+        self.callback = callback
+        self.display = display.Display()
+        self.root = self.display.screen().root
+        modifier_masks = {
+            'ctrl': X.ControlMask,
+            'shift': X.ShiftMask,
+            'alt': X.Mod1Mask,
+            'cmd': X.Mod4Mask,
+        }
+        # Lock keys change the event state, so grab every lock combination
+        self.relevant_mask = X.ControlMask | X.ShiftMask | X.Mod1Mask | X.Mod4Mask
+        lock_masks = (0, X.LockMask, X.Mod2Mask, X.LockMask | X.Mod2Mask)
+
+        self.grabs = {}
+        for action, combo in bindings.items():
+            keys = parse_hotkey(combo)
+            mask = 0
+            keysym = None
+            for key in keys:
+                if key in modifier_masks:
+                    mask |= modifier_masks[key]
+                else:
+                    keysym = XK.string_to_keysym(key)
+                    if not keysym:
+                        keysym = XK.string_to_keysym(key.upper())  # e.g. 'F1'
+            keycode = self.display.keysym_to_keycode(keysym) if keysym else 0
+            if not keycode:
+                raise ValueError(f'Cannot grab hotkey: {combo!r}')
+            self.grabs[(keycode, mask)] = action
+            for lock_mask in lock_masks:
+                self.root.grab_key(
+                    keycode, mask | lock_mask, True, X.GrabModeAsync, X.GrabModeAsync
+                )
+        self.display.flush()
+        self._x = X
+        self._wake_read, self._wake_write = os.pipe()
+        self._thread = threading.Thread(
+            target=self.run, name='x11-hotkeys', daemon=True
+        )
+
+    @staticmethod
+    def available():
+        if not os.environ.get('DISPLAY'):
+            return False
+        try:
+            import Xlib.display  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def run(self):
+        fd = self.display.fileno()
+        while True:
+            readable, _, _ = select.select([fd, self._wake_read], [], [])
+            if self._wake_read in readable:
+                break
+            while self.display.pending_events():
+                event = self.display.next_event()
+                if event.type != self._x.KeyPress:
+                    continue
+                state = event.state & self.relevant_mask
+                action = self.grabs.get((event.detail, state))
+                if action is not None:
+                    self.callback(action)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        os.write(self._wake_write, b'\0')
+        self._thread.join()
+        for keycode, _ in self.grabs:
+            self.root.ungrab_key(keycode, self._x.AnyModifier)
+        self.display.close()
+
+
+class NullBackend:
+    """No global hotkeys; actions arrive only through KeyboardManager.activate."""
+
+    name = 'none'
+
+    def __init__(self, bindings, callback):
+        self.callback = callback
+
+    @staticmethod
+    def available():
+        return True
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+BACKENDS = {
+    'x11': X11GrabBackend,
+    'pynput': PynputBackend,
+    'none': NullBackend,
+}
+
 
 class KeyboardManager(QObject):
     drawing_mode_toggled = pyqtSignal()  # Signal emitted when hotkey is activated
+    clear_requested = pyqtSignal()
+    arrow_type_requested = pyqtSignal(str)
+    # Backends call back from their own thread; this queued signal moves
+    # every action onto the thread the manager lives in (the Qt GUI thread)
+    _action_triggered = pyqtSignal(str)
 
-    def __init__(self):
+    def __init__(self, bindings=None, backend='auto'):
         super().__init__()
-        self._hotkey_config = '<ctrl>+<alt>+<shift>+d'
-        self.setup_hotkey_listener()
-
-    def setup_hotkey_listener(self):
-        """Set up the key listener with the parsed hotkey."""
-        self.hotkey = keyboard.HotKey(
-            keyboard.HotKey.parse(self._hotkey_config),
-            self.activate
-        )
-        self.listener = keyboard.Listener(
-            on_press=self.for_canonical(self.hotkey.press),
-            on_release=self.for_canonical(self.hotkey.release)
+        self._bindings = dict(bindings or DEFAULT_BINDINGS)
+        self._action_triggered.connect(
+            self.handle_action, Qt.ConnectionType.QueuedConnection
         )
-        self.listener.start()
+        self.backend = self.create_backend(backend)
+        self.backend.start()
+
+    def create_backend(self, backend):
+        """Create the requested backend, preferring native grabs on 'auto'."""
+        if backend != 'auto':
+            return BACKENDS[backend](self._bindings, self.activate)
+        if X11GrabBackend.available():
+            try:
+                return X11GrabBackend(self._bindings, self.activate)
+            except Exception as e:
+                print(f'X11 hotkey grab unavailable, falling back to pynput: {e}')
+        return PynputBackend(self._bindings, self.activate)
+
+    def activate(self, action='toggle'):
+        """Handle the activation of a hotkey from any thread."""
+        self._action_triggered.emit(action)
 
-    def activate(self):
-        """Handle the activation of the hotkey."""
-        self.drawing_mode_toggled.emit()
+    def handle_action(self, action):
+        if action == 'toggle':
+            self.drawing_mode_toggled.emit()
+        elif action == 'clear':
+            self.clear_requested.emit()
+        elif action.startswith('arrow_'):
+            self.arrow_type_requested.emit(action[len('arrow_'):])
 
-    def for_canonical(self, f):
-        """Wrapper for canonical key handling."""
-        return lambda k: f(self.listener.canonical(k))
+    def stop(self):
+        self.backend.stop()
@@ -0,0 +1,200 @@
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import deque
+
+DEFAULT_CAPACITY = 4096  # Samples kept per ring buffer
+
+
+def now_us():
+    return time.perf_counter_ns() // 1000
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Metrics:
+    """Frame-time and input-latency recorder for the overlay.
+
+    Call sites check ``metrics.enabled`` before recording anything, so a
+    disabled recorder costs one attribute lookup per paint or event. Samples
+    go into fixed-size ring buffers; old samples are dropped, never grown.
+    """
+
+    def __init__(self, enabled=False, capacity=DEFAULT_CAPACITY):
+        self.enabled = enabled
+        self.hud_visible = False
+        self.paints = deque(maxlen=capacity)  # (start_us, duration_us, area, arrows)
+        self.latencies = deque(maxlen=capacity)  # (input_us, latency_us)
+        self.ticks = deque(maxlen=capacity)  # (tick_us, jitter_us)
+        self.marks = deque(maxlen=capacity)  # (time_us, name, args)
+        self.last_dump = None  # Path of the latest dump(), shown on the HUD
+        self._pending_input = None
+        self._last_tick = None
+
+    def clear(self):
+        self.paints.clear()
+        self.latencies.clear()
+        self.ticks.clear()
+        self.marks.clear()
+        self._pending_input = None
+        self._last_tick = None
+
+    def input_event(self):
+        """Note an input event whose effect has not been painted yet."""
+        if self._pending_input is None:
+            self._pending_input = now_us()
+
+    def paint(self, start_us, area, arrows):
+        """Record a finished paint that started at start_us."""
+        end = now_us()
+        self.paints.append((start_us, end - start_us, area, arrows))
+        if self._pending_input is not None:
+            self.latencies.append((self._pending_input, end - self._pending_input))
+            self._pending_input = None
+
+    def timer_tick(self, interval_ms):
+        """Record how far an animation tick landed from its expected time."""
+        tick = now_us()
+        if self._last_tick is not None:
+            self.ticks.append((tick, tick - self._last_tick - interval_ms * 1000))
+        self._last_tick = tick
+
+    def timer_stopped(self):
+        self._last_tick = None
+
+    def mark(self, name, **args):
+        """Record an instantaneous event such as a mode toggle."""
+        self.marks.append((now_us(), name, args))
+
+    def paint_histogram(self):
+        """Return paint counts in power-of-two microsecond buckets."""
+        histogram = {}
+        for _, duration, _, _ in self.paints:
+            bucket = 1 << max(0, int(duration).bit_length() - 1)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+        return {f"<{bucket * 2}us": histogram[bucket] for bucket in sorted(histogram)}
+
+    def summary(self):
+        durations = [paint[1] for paint in self.paints]
+        latencies = [latency[1] for latency in self.latencies]
+        jitter = [abs(tick[1]) for tick in self.ticks]
+        return {
+            "paints": len(durations),
+            "paint_us": {
+                "mean": statistics.fmean(durations) if durations else None,
+                "p50": percentile(durations, 0.5),
+                "p95": percentile(durations, 0.95),
+                "p99": percentile(durations, 0.99),
+                "max": max(durations, default=None),
+            },
+            "paint_histogram": self.paint_histogram(),
+            "repainted_area_px": sum(paint[2] for paint in self.paints),
+            "arrows": self.paints[-1][3] if self.paints else 0,
+            "input_latency_us": {
+                "p50": percentile(latencies, 0.5),
+                "p95": percentile(latencies, 0.95),
+                "max": max(latencies, default=None),
+            },
+            "timer_jitter_us": {
+                "p50": percentile(jitter, 0.5),
+                "p95": percentile(jitter, 0.95),
+                "max": max(jitter, default=None),
+            },
+        }
+
+    def hud_lines(self):
+        """Return a few short lines of text for the on-screen HUD."""
+        recent = list(self.paints)[-120:]
+        durations = [paint[1] / 1000 for paint in recent]
+        latencies = [latency[1] / 1000 for latency in list(self.latencies)[-120:]]
+        jitter = [abs(tick[1]) / 1000 for tick in list(self.ticks)[-120:]]
+        fps = 0.0
+        if len(recent) > 1:
+            span = recent[-1][0] - recent[0][0]
+            fps = (len(recent) - 1) * 1e6 / span if span else 0.0
+        lines = [
+            f"paint p50 {percentile(durations, 0.5) or 0:.2f} ms"
+            f"  p95 {percentile(durations, 0.95) or 0:.2f} ms  {fps:.0f} fps",
+            f"latency p95 {percentile(latencies, 0.95) or 0:.2f} ms"
+            f"  jitter p95 {percentile(jitter, 0.95) or 0:.2f} ms",
+            f"arrows {recent[-1][3] if recent else 0}"
+            f"  area {recent[-1][2] if recent else 0} px",
+        ]
+        if self.last_dump is not None:
+            lines.append(f"trace {self.last_dump}")
+        return lines
+
+    def chrome_trace(self):
+        """Return the samples in Chrome trace event format."""
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = [
+            {
+                "name": "paint",
+                "ph": "X",
+                "ts": start,
+                "dur": duration,
+                "pid": pid,
+                "tid": tid,
+                "args": {"area": area, "arrows": arrows},
+            }
+            for start, duration, area, arrows in self.paints
+        ]
+        events += [
+            {
+                "name": "input_to_paint",
+                "ph": "X",
+                "ts": start,
+                "dur": latency,
+                "pid": pid,
+                "tid": tid + 1,
+            }
+            for start, latency in self.latencies
+        ]
+        events += [
+            {
+                "name": "timer_jitter",
+                "ph": "C",
+                "ts": tick,
+                "pid": pid,
+                "args": {"us": jitter},
+            }
+            for tick, jitter in self.ticks
+        ]
+        events += [
+            {
+                "name": name,
+                "ph": "i",
+                "s": "p",
+                "ts": ts,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            }
+            for ts, name, args in self.marks
+        ]
+        return {"traceEvents": events, "otherData": self.summary()}
+
+    def dump(self, path=None):
+        """Write the summary and trace to a JSON file and return its path."""
+        if path is None:
+            path = os.path.join(
+                tempfile.gettempdir(),
+                f"arrows-trace-{os.getpid()}-{int(time.time())}.json",
+            )
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+        self.last_dump = path
+        return path
+
+
+# Shared recorder, enabled by setting ARROWS_METRICS=1 or toggling the HUD
+metrics = Metrics(enabled=bool(os.environ.get("ARROWS_METRICS")))
@@ -0,0 +1,333 @@
+"""Record drawing sessions and replay them live or render them to PNGs.
+
+A recording is a JSON Lines file: a header with the overlay size and the
+initial tool, color, lifetime, shape fading and drawing mode, then one
+[time_ms, kind, *args] line per pointer press, move and release, mode
+toggle, clear, tool, color, lifetime or shape fading change, label text
+entered, undo and redo. Usage:
+
+    python recording.py play session.jsonl [--speed 2]
+    python recording.py render session.jsonl frames/ [--fps 30] [--jobs 8]
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from PyQt6.QtCore import QElapsedTimer, QObject, QPoint, Qt, QTimer, pyqtSignal
+from PyQt6.QtGui import QColor, QImage
+from PyQt6.QtWidgets import QApplication
+from animation import now_ms, use_clock
+
+FORMAT = "arrows-recording"
+VERSION = 1
+FRAME_NAME = "frame-%06d.png"
+CHUNKS_PER_JOB = 4  # Frame ranges handed out per worker, for load balancing
+
+
+class Recorder:
+    """Append a window's input and mode events to a recording file."""
+
+    def __init__(self, window, path):
+        self.start = now_ms()
+        self.file = open(path, "w")
+        widget = window.transparent_widget
+        header = {
+            "format": FORMAT,
+            "version": VERSION,
+            "width": widget.width(),
+            "height": widget.height(),
+            "tool": window.current_arrow_type,
+            "color": window.current_color.rgba(),
+            "lifetime": window.current_lifetime,
+            "dissolve_shapes": window.dissolve_shapes,
+            "drawing_mode": window.drawing_mode,
+        }
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, kind, *args):
+        self.file.write(json.dumps([now_ms() - self.start, kind, *args]) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+@lru_cache(maxsize=4)
+def load(path):
+    """Return (header, events) of a recording."""
+    with open(path) as f:
+        header = json.loads(f.readline())
+        if header.get("format") != FORMAT or header.get("version") != VERSION:
+            raise ValueError(f"Not a recording this version can read: {path}")
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+class VirtualClock:
+    """Replay time that now_ms() follows during a headless render."""
+
+    def __init__(self):
+        self.time = 0
+
+    def __call__(self):
+        return self.time
+
+
+class Replay:
+    """Apply a recording's events to a window in time order.
+
+    Pointer events go through TransparentWidget's pointer handlers, so
+    replayed arrows, strokes, shapes and edits behave exactly as when
+    drawn. Labels take their text from the recording instead of asking
+    for it. A clock, if given, is set to each event's time before it is
+    applied.
+    """
+
+    def __init__(self, window, header, events, clock=None, live=False):
+        self.window = window
+        self.events = events
+        self.clock = clock
+        self.live = live
+        self.position = 0
+        window.set_arrow_type(header["tool"])
+        window.current_color = QColor.fromRgba(header["color"])
+        window.current_lifetime = header["lifetime"]
+        window.set_dissolve_shapes(header.get("dissolve_shapes", False))
+        window.label_prompt = self.label_text
+        self.set_mode(header["drawing_mode"])
+
+    def next_time(self):
+        """Return the time of the next event, or None at the end."""
+        if self.position < len(self.events):
+            return self.events[self.position][0]
+        return None
+
+    def label_text(self):
+        """Return the text entered for the label placed by the current event."""
+        # The text is recorded once the prompt closes, after the release
+        for event in self.events[self.position + 1 :]:
+            if event[1] == "label":
+                return event[2]
+            if event[1] == "press":
+                break
+        return None
+
+    def advance(self, time):
+        """Apply every event up to time and return how many there were."""
+        start = self.position
+        events = self.events
+        while self.position < len(events) and events[self.position][0] <= time:
+            if self.clock is not None:
+                self.clock.time = events[self.position][0]
+            self.apply(events[self.position])
+            self.position += 1
+        return self.position - start
+
+    def apply(self, event):
+        time, kind, *args = event
+        window = self.window
+        widget = window.transparent_widget
+        if kind == "press":
+            widget.pointer_press(QPoint(*args))
+        elif kind == "move":
+            widget.pointer_move(QPoint(*args), time)
+        elif kind == "release":
+            widget.pointer_release(QPoint(*args))
+        elif kind == "mode":
+            self.set_mode(args[0])
+        elif kind == "clear":
+            window.clear_arrows()
+        elif kind == "tool":
+            window.set_arrow_type(args[0])
+        elif kind == "color":
+            window.current_color = QColor.fromRgba(args[0])
+        elif kind == "lifetime":
+            window.current_lifetime = args[0]
+        elif kind == "fade":
+            window.set_dissolve_shapes(args[0])
+        elif kind == "undo":
+            window.undo()
+        elif kind == "redo":
+            window.redo()
+
+    def set_mode(self, drawing_mode):
+        if self.window.drawing_mode == drawing_mode:
+            return
+        if self.live:
+            self.window.toggle_drawing_mode()
+        else:
+            self.window.drawing_mode = drawing_mode  # No window to show
+
+
+class Player(QObject):
+    """Replay a recording into a visible window at speed times real time.
+
+    now_ms() is switched to the recording's time scale, so dissolving
+    arrows fade at the recorded pace relative to the drawing.
+    """
+
+    finished = pyqtSignal()
+
+    def __init__(self, window, header, events, speed=1.0):
+        super().__init__(window)
+        self.replay = Replay(window, header, events, live=True)
+        self.speed = speed
+        self.elapsed = QElapsedTimer()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.timer.timeout.connect(self.step)
+
+    def now(self):
+        return int(self.elapsed.elapsed() * self.speed)
+
+    def start(self):
+        use_clock(self.now)
+        self.elapsed.start()
+        self.step()
+
+    def fade_out_ms(self):
+        """Return the real time until the last dissolving arrow has faded."""
+        store = self.replay.window.dissolving_arrows
+        end = max(map(sum, zip(store.created, store.lifetime)), default=0)
+        return max(0, int((end - self.now()) / self.speed))
+
+    def step(self):
+        now = self.now()
+        self.replay.advance(now)
+        next_time = self.replay.next_time()
+        if next_time is None:
+            self.finished.emit()
+        else:
+            self.timer.start(max(0, int((next_time - now) / self.speed)))
+
+
+def frame_count(events, fps, tail_ms=0):
+    """Return the number of frames covering the recording plus tail_ms."""
+    duration = (events[-1][0] if events else 0) + tail_ms
+    return duration * fps // 1000 + 1
+
+
+@lru_cache(maxsize=None)
+def worker_app():
+    """Create the headless QApplication of a render worker process."""
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    os.environ["ARROWS_RENDERER"] = "raster"
+    return QApplication.instance() or QApplication(sys.argv[:1])
+
+
+def render_frames(path, first, last, fps, directory, background=None):
+    """Render frames [first, last) of a recording to PNGs in directory.
+
+    The recording is replayed from its start, frame by frame, so pointer
+    coalescing and expiry happen at the same times in every worker; only
+    frames from first on are drawn. A frame nothing changed in since the
+    previous one is hard-linked to it instead of being encoded again.
+    """
+    worker_app()
+    import screen_drawer
+
+    header, events = load(path)
+    clock = VirtualClock()
+    use_clock(clock)
+    window = screen_drawer.TransparentWindow()
+    widget = window.transparent_widget
+    widget.resize(header["width"], header["height"])
+    replay = Replay(window, header, events, clock)
+    image = QImage(widget.size(), QImage.Format.Format_ARGB32_Premultiplied)
+    previous = None
+    fading = False
+    for frame in range(last):
+        time = frame * 1000 // fps
+        changed = replay.advance(time) or fading
+        clock.time = time
+        widget.flush_pointer()
+        window.update_dissolving_arrows()
+        fading = bool(window.dissolving_arrows)
+        if frame < first:
+            continue
+        output = os.path.join(directory, FRAME_NAME % frame)
+        if os.path.exists(output):
+            os.remove(output)
+        if previous is not None and not changed and not fading:
+            try:
+                os.link(previous, output)
+            except OSError:
+                shutil.copyfile(previous, output)
+        else:
+            image.fill(QColor(background) if background else Qt.GlobalColor.transparent)
+            widget.render(image)
+            image.save(output)
+        previous = output
+    window.close()
+    return last - first
+
+
+def render(path, directory, fps=30, jobs=None, background=None, tail_ms=0):
+    """Render a recording to a PNG sequence with a pool of processes.
+
+    Returns the number of frames written.
+    """
+    header, events = load(path)
+    frames = frame_count(events, fps, tail_ms)
+    os.makedirs(directory, exist_ok=True)
+    jobs = jobs or os.cpu_count() or 1
+    chunk = -(-frames // (jobs * CHUNKS_PER_JOB))
+    ranges = [(first, min(first + chunk, frames)) for first in range(0, frames, chunk)]
+    # Qt does not survive fork(), so workers are spawned fresh
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(jobs, mp_context=context) as pool:
+        futures = [
+            pool.submit(render_frames, path, first, last, fps, directory, background)
+            for first, last in ranges
+        ]
+        return sum(future.result() for future in futures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    play = commands.add_parser("play", help="replay into a live overlay")
+    play.add_argument("recording")
+    play.add_argument("--speed", type=float, default=1.0)
+    export = commands.add_parser("render", help="render to a PNG sequence")
+    export.add_argument("recording")
+    export.add_argument("directory")
+    export.add_argument("--fps", type=int, default=30)
+    export.add_argument("--jobs", type=int, help="worker processes (default: CPUs)")
+    export.add_argument("--background", help="fill color (default: transparent)")
+    export.add_argument(
+        "--tail", type=int, default=0, help="ms to keep rendering after the end"
+    )
+    args = parser.parse_args()
+
+    if args.command == "render":
+        count = render(
+            args.recording,
+            args.directory,
+            args.fps,
+            args.jobs,
+            args.background,
+            args.tail,
+        )
+        print(f"Rendered {count} frames to {args.directory}")
+        return
+
+    app = QApplication(sys.argv[:1])
+    import screen_drawer
+
+    header, events = load(args.recording)
+    window = screen_drawer.TransparentWindow()
+    window.show()
+    player = Player(window, header, events, args.speed)
+    # Quit once the last dissolving arrows have faded out
+    player.finished.connect(lambda: QTimer.singleShot(player.fade_out_ms(), app.quit))
+    player.start()
+    sys.exit(app.exec())
+
+
+if __name__ == "__main__":
+    main()
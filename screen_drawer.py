@@ -1,6 +1,12 @@
+import time
+
+_START = time.perf_counter()  # Taken before the heavy imports below
+
+import os
 import sys
-import math
-from keyboard_manager import KeyboardManager
+from bisect import bisect_left
+from collections import deque
+from functools import lru_cache
 from PyQt6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -8,25 +14,189 @@ from PyQt6.QtWidgets import (
     QToolBar,
     QPushButton,
     QColorDialog,
+    QInputDialog,
     QVBoxLayout,
     QSizePolicy,
 )
 from PyQt6.QtCore import (
     Qt,
     QPoint,
-    QTimer,
-    QTime,
     QPropertyAnimation,
     QEasingCurve,
     QRect,
+    QRectF,
+    QLine,
+    QTimer,
+    QEvent,
+    QObject,
+    QStandardPaths,
+)
+from PyQt6.QtGui import QPainter, QPen, QColor, QPixmap, QKeySequence, QRegion
+from arrow_icons import (
+    create_arrow_icon,
+    create_pen_icon,
+    create_shape_icon,
+    create_toggle_icon,
 )
-from PyQt6.QtGui import QPainter, QPen, QColor, QIcon, QPolygon, QPixmap
-from arrow_icons import create_arrow_icon
+from animation import AnimationScheduler, now_ms
+from spatial_index import SpatialIndex, segment_distance
+from strokes import StrokeBuilder
+from shapes import BOX_KINDS, SHAPE_KINDS, make_label, make_shape, label_font
+from journal import Journal, replay
+from history import History
+from expiry import ExpiryQueue
+from metrics import metrics, now_us
+from arrow_store import ArrowStore, arrow_head, KIND_NORMAL, KIND_DISSOLVING
+
+# Arrow rendering parameters shared by painting and damage tracking
+PEN_WIDTH = 4
+ARROW_HEAD_ANGLE = 30  # degrees
+ARROW_HEAD_LENGTH = 20
+ARROW_MARGIN = ARROW_HEAD_LENGTH + PEN_WIDTH
+# Lifetimes the toolbar offers for dissolving arrows, in milliseconds
+LIFETIME_PRESETS_MS = (1000, 2000, 5000, 10000, 30000)
+DEFAULT_LIFETIME_MS = 2000
+OPACITY_STEPS = 64  # Fading arrows are batched into this many opacity buckets
+HIT_RADIUS = 8  # Distance in pixels within which the eraser/select tools hit
+HUD_RECT = QRect(10, 10, 460, 84)  # Where the metrics HUD is drawn
+MOTION_SAMPLES = 4  # Recent pointer samples used for motion prediction
+MAX_PREDICTION = 48  # Furthest a predicted point may lead the pointer, in pixels
+INDEX_CHUNK = 2000  # Restored arrows indexed per idle step
+# Toolbar tooltips of the shape tools, one per kind in SHAPE_KINDS
+SHAPE_TOOLTIPS = {
+    "rectangle": "Rectangle",
+    "ellipse": "Ellipse",
+    "highlight": "Highlight Box",
+    "text": "Text Label",
+}
+
+# Milliseconds since this module started importing at which each startup
+# step finished, filled in by start()
+STARTUP_TIMINGS = {}
+
+
+def arrow_bounds(start, end):
+    """Return the rect covered by an arrow, including its head and pen width."""
+    return (
+        QRect(start, end)
+        .normalized()
+        .adjusted(-ARROW_MARGIN, -ARROW_MARGIN, ARROW_MARGIN, ARROW_MARGIN)
+    )
+
+
+def arrow_lines(x1, y1, x2, y2, hx1, hy1, hx2, hy2):
+    """Return the shaft and the two head barbs of an arrow as QLines."""
+    return (
+        QLine(x1, y1, x2, y2),
+        QLine(x2, y2, hx1, hy1),
+        QLine(x2, y2, hx2, hy2),
+    )
+
+
+def row_bounds(row, dx=0, dy=0):
+    """Return the rect covered by an ArrowStore row, optionally offset."""
+    return arrow_bounds(
+        QPoint(row[0] + dx, row[1] + dy), QPoint(row[2] + dx, row[3] + dy)
+    )
+
+
+def row_lines(row, dx=0, dy=0):
+    """Return the QLines of an ArrowStore row, optionally offset."""
+    x1, y1, x2, y2, hx1, hy1, hx2, hy2 = row[:8]
+    return arrow_lines(
+        x1 + dx, y1 + dy, x2 + dx, y2 + dy, hx1 + dx, hy1 + dy, hx2 + dx, hy2 + dy
+    )
+
+
+def env_limit(name):
+    """Return the non-negative integer limit set in environment variable name.
+
+    Unset means 0, no limit. An invalid value is reported and ignored rather
+    than keeping the overlay from starting.
+    """
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return 0
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        print(
+            f"Ignoring {name}={value!r}, expected a whole number >= 0", file=sys.stderr
+        )
+        return 0
+    return limit
+
+
+def session_path(name="session"):
+    """Return the journal path for a session, or None if persistence is off.
+
+    ARROWS_SESSION names the directory to keep journals in, or 'off'.
+    """
+    directory = os.environ.get("ARROWS_SESSION")
+    if directory == "off":
+        return None
+    if not directory:
+        directory = QStandardPaths.writableLocation(
+            QStandardPaths.StandardLocation.AppDataLocation
+        )
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{name}.journal")
+
+
+def stroke_bounds(stroke):
+    """Return the rect covered by a finished stroke, including its pen width."""
+    left, top, right, bottom = stroke.extent
+    return QRect(
+        QPoint(left - PEN_WIDTH, top - PEN_WIDTH),
+        QPoint(right + PEN_WIDTH, bottom + PEN_WIDTH),
+    )
+
+
+def shape_bounds(shape):
+    """Return the rect covered by a finished shape or label."""
+    left, top, right, bottom = shape.extent
+    return QRect(QPoint(left, top), QPoint(right, bottom))
+
+
+def store_bounds(store, start=0):
+    """Return the rect covered by the arrows of an ArrowStore from index
+    start on."""
+    extent = store.extent(start)
+    if extent is None:
+        return QRect()
+    left, top, right, bottom = extent
+    return QRect(
+        QPoint(left - ARROW_MARGIN, top - ARROW_MARGIN),
+        QPoint(right + ARROW_MARGIN, bottom + ARROW_MARGIN),
+    )
+
+
+def rows_bounds(rows):
+    """Return the rect covered by several ArrowStore rows."""
+    if not rows:
+        return QRect()
+    xs = [row[0] for row in rows] + [row[2] for row in rows]
+    ys = [row[1] for row in rows] + [row[3] for row in rows]
+    return QRect(
+        QPoint(min(xs) - ARROW_MARGIN, min(ys) - ARROW_MARGIN),
+        QPoint(max(xs) + ARROW_MARGIN, max(ys) + ARROW_MARGIN),
+    )
 
 
 class TransparentWindow(QMainWindow):
-    def __init__(self):
+    """Overlay covering one screen, holding the arrows drawn on it.
+
+    With several screens each gets its own window, grouped by ScreenOverlays
+    so tools, color and drawing mode stay in sync across them.
+    """
+
+    def __init__(self, screen=None, group=None):
         super().__init__()
+        self.overlay_screen = screen or QApplication.primaryScreen()
+        self.group = group
+        self.has_toolbar = True  # Only one overlay of a group shows the toolbar
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.setAttribute(Qt.WidgetAttribute.WA_NoSystemBackground)
 
@@ -45,27 +215,106 @@ class TransparentWindow(QMainWindow):
         self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating, False)
         self.drawing_mode = False
 
-        # Create transparent widget
-        self.transparent_widget = TransparentWidget(self)
+        # Create transparent widget, drawn with QPainter or OpenGL
+        self.transparent_widget = widget_class()(self)
         self.setCentralWidget(self.transparent_widget)
 
-        # Set window to full screen
-        screen = QApplication.primaryScreen().geometry()
-        self.setGeometry(screen)
-
-        # Initialize arrows list with tuples: (start, end, color, creation_time, is_dissolving)
-        self.arrows = []
-        self.current_arrow_type = "normal"  # or 'dissolving'
-
-        # Set up timer for dissolving arrows
-        self.fade_timer = QTimer()
-        self.fade_timer.timeout.connect(self.update_dissolving_arrows)
-        self.fade_timer.start(100)  # Update every 100ms
+        # Cover the whole screen; the widget's backing store and arrow layer
+        # follow the screen's device pixel ratio
+        self.setScreen(self.overlay_screen)
+        self.setGeometry(self.overlay_screen.geometry())
+        self.overlay_screen.geometryChanged.connect(self.fit_to_screen)
+
+        # Normal arrows never change once committed and are rasterized into the
+        # widget's arrow layer; dissolving arrows are redrawn every frame.
+        self.arrows = ArrowStore(ARROW_HEAD_LENGTH, ARROW_HEAD_ANGLE)
+        self.dissolving_arrows = ArrowStore(ARROW_HEAD_LENGTH, ARROW_HEAD_ANGLE)
+        # or 'dissolving', 'pen', 'rectangle', 'ellipse', 'highlight', 'text',
+        # 'eraser', 'select'
+        self.current_arrow_type = "normal"
+
+        # Finished freehand strokes in drawing order, rasterized into the
+        # arrow layer above the arrows
+        self.strokes = []
+        self.next_stroke_id = 0
+
+        # Finished shapes and labels in drawing order. Permanent ones are
+        # rasterized into the arrow layer above the strokes; with
+        # dissolve_shapes set, new ones fade out like dissolving arrows.
+        self.shapes = []
+        self.dissolving_shapes = []
+        self.next_shape_id = 0
+        self.dissolve_shapes = False
+        # Asks for the text of a label being placed; replaced during replay
+        self.label_prompt = self.ask_label_text
+
+        # Dissolving arrows each carry their own lifetime and leave the store
+        # in expiry order through this queue
+        self.current_lifetime = DEFAULT_LIFETIME_MS
+        self.expiry = ExpiryQueue()
+        self.shape_expiry = ExpiryQueue()  # Of dissolving shapes, by shape id
+
+        # Area covered by the dissolving arrows and shapes, grown as they are
+        # added so an animation frame need not scan them. It is recomputed
+        # once half of what it was computed over is gone, which keeps it
+        # tight at an amortized constant cost per expired arrow.
+        self.fade_bounds = QRect()
+        self.fade_bounds_count = 0
+
+        # Retention caps on normal arrows, 0 for no cap; the oldest arrows
+        # are evicted first once either is exceeded
+        self.max_arrows = env_limit("ARROWS_MAX_ARROWS")
+        self.memory_budget = env_limit("ARROWS_MEMORY_BUDGET")
+
+        # Grid indexes over arrow segments for the eraser and select tools
+        self.arrow_index = SpatialIndex()
+        self.dissolving_index = SpatialIndex()
+
+        # Restored arrows are indexed in chunks while idle, see load_session
+        self.index_backlog = []
+        self.index_timer = QTimer(self)
+        self.index_timer.timeout.connect(self.index_some)
+
+        # Committed normal arrows are journaled here when a session is loaded
+        self.journal = None
+
+        # Publishes arrow changes to other machines, see start_sync
+        self.sync = None
+
+        # Records input and mode changes for replay, see recording.py
+        self.recorder = None
+
+        # Undo/redo of the edits made with the tools
+        self.history = History(self.apply_command)
+
+        # Animate dissolving arrows at the display refresh rate, only while
+        # there are any on screen
+        self.fade_scheduler = AnimationScheduler(
+            self.overlay_screen.refreshRate(), self
+        )
+        self.fade_scheduler.frame.connect(self.update_dissolving_arrows)
+        self.overlay_screen.refreshRateChanged.connect(
+            self.fade_scheduler.set_refresh_rate
+        )
 
-        # Create floating toolbar window
-        self.toolbar = FloatingToolbar(self)
-        self.toolbar.toolbar_container.hide()  # Hide the container
-        self.toolbar.hide()  # Hide the entire toolbar initially
+        # Refresh the metrics HUD a few times a second while it is shown
+        self.hud_timer = QTimer(self)
+        self.hud_timer.setInterval(250)
+        self.hud_timer.timeout.connect(lambda: self.transparent_widget.update(HUD_RECT))
+
+        # Outside drawing mode the overlay is unmapped while empty and shaped
+        # to its annotations otherwise, see update_idle. ARROWS_IDLE=off
+        # keeps it mapped full-screen.
+        self.idle_unmap = os.environ.get("ARROWS_IDLE") != "off"
+        self.idle_bounds = QRect()  # Area the window is masked to, if any
+        self.idle_hidden = False  # Whether update_idle unmapped the window
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.timeout.connect(self.update_idle)
+        self.schedule_idle_check()
+
+        # The floating toolbar window is built on first use, see toolbar
+        self._toolbar = None
 
         # Initialize current color
         self.current_color = QColor(255, 0, 0)  # Default red
@@ -73,6 +322,52 @@ class TransparentWindow(QMainWindow):
         # Start without focus
         self.clearFocus()
 
+    @property
+    def toolbar(self):
+        """The floating toolbar, constructed the first time it is needed."""
+        if self._toolbar is None:
+            self._toolbar = FloatingToolbar(self)
+            self._toolbar.toolbar_container.hide()  # Hide the container
+            self._toolbar.hide()  # Hide the entire toolbar initially
+            self._toolbar.update_buttons(self.current_arrow_type)
+        return self._toolbar
+
+    def peers(self):
+        """Return every overlay in this window's group, itself included."""
+        if self.group is None:
+            return [self]
+        return self.group.windows()
+
+    def fit_to_screen(self):
+        geometry = self.overlay_screen.geometry()
+        self.setGeometry(geometry)
+        if self._toolbar is not None:
+            self._toolbar.place(geometry)
+        self.schedule_idle_check()
+
+    def use_raster_widget(self):
+        """Replace an OpenGL overlay widget whose renderer failed to start.
+
+        Overlays created afterwards use the raster widget straight away.
+        """
+        os.environ["ARROWS_RENDERER"] = "raster"
+        widget_class.cache_clear()
+        tracking = self.transparent_widget.hasMouseTracking()
+        self.transparent_widget = TransparentWidget(self)
+        self.setCentralWidget(self.transparent_widget)  # Deletes the old one
+        self.transparent_widget.setMouseTracking(tracking)
+        self.transparent_widget.update_cursor()
+        self.transparent_widget.show()
+
+    def select_arrow_type(self, arrow_type):
+        """Switch tools on every overlay of the group."""
+        for window in self.peers():
+            window.set_arrow_type(arrow_type)
+
+    def clear_all_arrows(self):
+        for window in self.peers():
+            window.clear_arrows()
+
     def choose_color(self):
         # Store current drawing mode state
         was_drawing = self.drawing_mode
@@ -83,87 +378,841 @@ class TransparentWindow(QMainWindow):
         # Show color dialog
         color = QColorDialog.getColor(self.current_color, self)
         if color.isValid():
-            self.current_color = color
+            for window in self.peers():
+                window.current_color = color
+            if self.recorder is not None:
+                self.recorder.record("color", color.rgba())
 
         # Restore drawing mode if it was active
         if was_drawing:
             self.toggle_drawing_mode()
 
+    def add_arrow(self, start, end, color, is_dissolving):
+        """Commit a finished arrow and repaint the area it covers."""
+        current_time = now_ms()
+        if is_dissolving:
+            store, kind, lifetime = (
+                self.dissolving_arrows,
+                KIND_DISSOLVING,
+                self.current_lifetime,
+            )
+        else:
+            store, kind, lifetime = self.arrows, KIND_NORMAL, 0
+        arrow_id = self.commit_arrow(
+            store,
+            start.x(),
+            start.y(),
+            end.x(),
+            end.y(),
+            color.rgba(),
+            current_time,
+            kind,
+            lifetime,
+        )
+        self.history.record(("erase", store, arrow_id))
+
+    def commit_arrow(self, store, x1, y1, x2, y2, rgba, created, kind, lifetime):
+        """Append an arrow to store, index, journal and publish it.
+
+        Returns the new arrow's id.
+        """
+        arrow_id = store.append(x1, y1, x2, y2, rgba, created, kind, lifetime)
+        self.index_for(store).insert(arrow_id, store.segments(len(store) - 1))
+        if self.sync is not None:
+            self.sync.publish_arrow(store, arrow_id)
+        start, end = QPoint(x1, y1), QPoint(x2, y2)
+        if store is self.dissolving_arrows:
+            self.expiry.push(created + lifetime, arrow_id)
+            self.add_fade_bounds(arrow_bounds(start, end))
+            self.fade_scheduler.request()
+        else:
+            self.transparent_widget.add_to_arrow_layer(
+                start, end, QColor.fromRgba(rgba)
+            )
+            if self.journal is not None:
+                self.journal.append(arrow_id)
+            self.enforce_retention()
+        self.transparent_widget.update(arrow_bounds(start, end))
+        self.schedule_idle_check()
+        return arrow_id
+
+    def add_arrows(self, arrows, color=None, dissolving=False, lifetime=None):
+        """Add many arrows at once, as a single undo step and repaint.
+
+        This is the entry point for scripts and the annotation socket.
+        arrows holds (x1, y1, x2, y2) tuples, optionally followed by a
+        packed ARGB color overriding color, which defaults to the current
+        one. Dissolving arrows last lifetime milliseconds, by default the
+        current lifetime. Returns the new arrows' ids.
+        """
+        rgba = (color or self.current_color).rgba()
+        if dissolving:
+            store, kind = self.dissolving_arrows, KIND_DISSOLVING
+            if lifetime is None:
+                lifetime = self.current_lifetime
+        else:
+            store, kind, lifetime = self.arrows, KIND_NORMAL, 0
+        created = now_ms()
+        ids = self.commit_arrows(
+            store,
+            (
+                (
+                    a[0],
+                    a[1],
+                    a[2],
+                    a[3],
+                    a[4] if len(a) > 4 else rgba,
+                    created,
+                    lifetime,
+                )
+                for a in arrows
+            ),
+            kind,
+        )
+        if ids:
+            self.history.record(("erase_many", store, ids))
+        return ids
+
+    def commit_arrows(self, store, arrows, kind):
+        """Append many (x1, y1, x2, y2, rgba, created, lifetime) arrows.
+
+        Like commit_arrow(), but the columns grow once, the arrow layer is
+        drawn in one pass and the covered area is repainted once. Returns
+        the new arrows' ids.
+        """
+        start = len(store)
+        ids = store.append_many(arrows, kind)
+        if not ids:
+            return ids
+        if store is self.arrows:
+            # Indexed while idle, like restored arrows, see load_session
+            self.index_backlog.extend(ids)
+            self.index_timer.start()
+        else:
+            for i, arrow_id in enumerate(ids, start):
+                self.dissolving_index.insert(arrow_id, store.segments(i))
+        if self.sync is not None:
+            for arrow_id in ids:
+                self.sync.publish_arrow(store, arrow_id)
+        dirty = store_bounds(store, start)
+        if store is self.dissolving_arrows:
+            for i, arrow_id in enumerate(ids, start):
+                self.expiry.push(store.created[i] + store.lifetime[i], arrow_id)
+            self.add_fade_bounds(dirty, len(ids))
+            self.fade_scheduler.request()
+        else:
+            self.transparent_widget.add_rows_to_arrow_layer(store.rows(start))
+            if self.journal is not None:
+                self.journal.append_many(ids)
+            self.enforce_retention()
+        self.transparent_widget.update(dirty)
+        self.schedule_idle_check()
+        return ids
+
+    def enforce_retention(self):
+        """Evict the oldest normal arrows until the retention caps are met."""
+        store = self.arrows
+        count = len(store) - self.max_arrows if self.max_arrows else 0
+        if self.memory_budget:
+            used = (len(store) + len(self.dissolving_arrows)) * store.bytes_per_arrow()
+            over = used - self.memory_budget
+            count = max(count, -(-over // store.bytes_per_arrow()))
+        count = min(count, len(store))
+        if count <= 0:
+            return
+        self.ensure_index()
+        dirty = QRect()
+        for i in range(count):
+            arrow_id = store.id[i]
+            self.arrow_index.remove(arrow_id, store.segments(i))
+            dirty = dirty.united(row_bounds(store.row(i)))
+            if self.journal is not None:
+                self.journal.remove(arrow_id)
+            if self.sync is not None:
+                self.sync.publish_remove(store, arrow_id)
+        store.remove_first(count)
+        if metrics.enabled:
+            metrics.mark("evict_arrows", count=count)
+        self.transparent_widget.repaint_arrow_layer(dirty)
+        self.transparent_widget.update(dirty)
+
+    def cycle_lifetime(self):
+        """Switch every overlay to the next dissolving arrow lifetime preset."""
+        presets = LIFETIME_PRESETS_MS
+        if self.current_lifetime in presets:
+            lifetime = presets[
+                (presets.index(self.current_lifetime) + 1) % len(presets)
+            ]
+        else:
+            lifetime = DEFAULT_LIFETIME_MS
+        for window in self.peers():
+            window.current_lifetime = lifetime
+            if window._toolbar is not None:
+                window._toolbar.update_lifetime(lifetime)
+        if self.recorder is not None:
+            self.recorder.record("lifetime", lifetime)
+
+    def load_session(self, path):
+        """Restore the arrows journaled at path and keep journaling to it.
+
+        Must be called before any arrow is drawn. Building the spatial index
+        of the restored arrows is spread over idle time instead of delaying
+        startup.
+        """
+        valid_size = replay(path, self.arrows)
+        self.index_backlog = self.arrows.id.tolist()
+        if self.index_backlog:
+            self.index_timer.start()
+            self.transparent_widget.invalidate_arrow_layer()
+            self.transparent_widget.update()
+        self.schedule_idle_check()
+        self.journal = Journal(path, self.arrows, valid_size)
+        return len(self.arrows)
+
+    def close_session(self):
+        """Write out pending journal records and stop journaling."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
+
+    def start_sync(self, mode, address=""):
+        """Publish this window's arrows, or mirror a publisher's, over TCP.
+
+        mode is 'publish' or 'subscribe'; address is 'host:port' and
+        defaults to localhost.
+        """
+        from sync import SyncPublisher, SyncSubscriber, parse_address
+
+        host, port = parse_address(address)
+        if mode == "publish":
+            self.sync = SyncPublisher(self, host, port)
+            return self.sync
+        if mode == "subscribe":
+            return SyncSubscriber(self, host, port)
+        raise ValueError(f"Unknown sync mode: {mode!r}")
+
+    def index_some(self, count=INDEX_CHUNK):
+        """Index up to count restored or bulk-added arrows."""
+        store = self.arrows
+        for arrow_id in self.index_backlog[-count:]:
+            i = store.index_of(arrow_id)
+            if i is not None:
+                self.arrow_index.insert(arrow_id, store.segments(i))
+        del self.index_backlog[-count:]
+        if not self.index_backlog:
+            self.index_timer.stop()
+
+    def ensure_index(self):
+        """Finish indexing the backlog before the index is queried."""
+        if self.index_backlog:
+            self.index_some(len(self.index_backlog))
+
+    def add_stroke(self, builder, color):
+        """Commit a finished freehand stroke and repaint the area it covers."""
+        stroke = builder.finish(self.next_stroke_id, color.rgba())
+        self.next_stroke_id += 1
+        self.strokes.append(stroke)
+        self.history.record(("erase_stroke", stroke))
+        self.transparent_widget.add_stroke_to_layer(stroke)
+        self.transparent_widget.update(stroke_bounds(stroke))
+        self.schedule_idle_check()
+
+    def stroke_at(self, pos):
+        """Return the topmost stroke passing within HIT_RADIUS of pos, or None."""
+        x, y = pos.x(), pos.y()
+        for stroke in reversed(self.strokes):
+            left, top, right, bottom = stroke.extent
+            if (
+                x < left - HIT_RADIUS
+                or x > right + HIT_RADIUS
+                or y < top - HIT_RADIUS
+                or y > bottom + HIT_RADIUS
+            ):
+                continue
+            if len(stroke.points) == 2:
+                if abs(x - left) <= HIT_RADIUS and abs(y - top) <= HIT_RADIUS:
+                    return stroke
+            elif any(
+                segment_distance(x, y, *segment) <= HIT_RADIUS
+                for segment in stroke.segments()
+            ):
+                return stroke
+        return None
+
+    def take_stroke(self, stroke):
+        self.strokes.remove(stroke)
+        bounds = stroke_bounds(stroke)
+        self.transparent_widget.repaint_arrow_layer(bounds)
+        self.transparent_widget.update(bounds)
+        self.schedule_idle_check()
+
+    def add_shape(self, kind, rect, color):
+        """Commit a finished rectangle, ellipse or highlight box over rect."""
+        lifetime = self.current_lifetime if self.dissolve_shapes else 0
+        self.commit_shape(
+            make_shape(
+                self.next_shape_id,
+                kind,
+                color.rgba(),
+                rect,
+                PEN_WIDTH,
+                now_ms(),
+                lifetime,
+            )
+        )
+
+    def place_label(self, pos, color):
+        """Ask for a label's text and commit it with its top left at pos."""
+        text = self.label_prompt()
+        if self.recorder is not None:
+            self.recorder.record("label", text)
+        if not text:
+            return
+        lifetime = self.current_lifetime if self.dissolve_shapes else 0
+        self.commit_shape(
+            make_label(
+                self.next_shape_id,
+                text,
+                color.rgba(),
+                pos.x(),
+                pos.y(),
+                now_ms(),
+                lifetime,
+            )
+        )
+
+    def ask_label_text(self):
+        """Ask for the text of a new label; return None if cancelled."""
+        # As in choose_color, drawing mode would take focus from the dialog
+        was_drawing = self.drawing_mode
+        if was_drawing:
+            self.toggle_drawing_mode()
+        text, ok = QInputDialog.getText(self, "Label", "Text:")
+        if was_drawing:
+            self.toggle_drawing_mode()
+        return text if ok and text else None
+
+    def commit_shape(self, shape):
+        self.next_shape_id += 1
+        self.history.record(("erase_shape", shape))
+        self.put_shape(shape)
+
+    def put_shape(self, shape):
+        """Add a shape to its list in drawing order and repaint its area."""
+        bounds = shape_bounds(shape)
+        if shape.lifetime:
+            self.dissolving_shapes.insert(
+                bisect_left(
+                    self.dissolving_shapes, shape.id, key=lambda other: other.id
+                ),
+                shape,
+            )
+            self.shape_expiry.push(shape.created + shape.lifetime, shape.id)
+            self.add_fade_bounds(bounds)
+            self.fade_scheduler.request()
+        elif not self.shapes or self.shapes[-1].id < shape.id:
+            self.shapes.append(shape)
+            self.transparent_widget.add_shape_to_layer(shape)
+        else:
+            # Restored below newer shapes, which must stay on top
+            self.shapes.insert(
+                bisect_left(self.shapes, shape.id, key=lambda other: other.id), shape
+            )
+            self.transparent_widget.repaint_arrow_layer(bounds)
+        self.transparent_widget.update(bounds)
+        self.schedule_idle_check()
+
+    def take_shape(self, shape):
+        bounds = shape_bounds(shape)
+        if shape.lifetime:
+            self.dissolving_shapes.remove(shape)
+        else:
+            self.shapes.remove(shape)
+            self.transparent_widget.repaint_arrow_layer(bounds)
+        self.transparent_widget.update(bounds)
+        self.schedule_idle_check()
+
+    def shape_at(self, pos):
+        """Return the topmost shape or label hit at pos, or None."""
+        x, y = pos.x(), pos.y()
+        # Dissolving shapes are painted above the arrow layer
+        for shapes in (self.dissolving_shapes, self.shapes):
+            for shape in reversed(shapes):
+                left, top, right, bottom = shape.extent
+                if (
+                    left - HIT_RADIUS <= x <= right + HIT_RADIUS
+                    and top - HIT_RADIUS <= y <= bottom + HIT_RADIUS
+                    and shape.hit(x, y, HIT_RADIUS)
+                ):
+                    return shape
+        return None
+
+    def set_dissolve_shapes(self, dissolve):
+        """Make new shapes and labels on every overlay fade out, or stay."""
+        for window in self.peers():
+            window.dissolve_shapes = dissolve
+            if window._toolbar is not None:
+                window._toolbar.fade_button.setChecked(dissolve)
+        if self.recorder is not None:
+            self.recorder.record("fade", dissolve)
+
     def clear_arrows(self):
+        dirty = store_bounds(self.arrows).united(store_bounds(self.dissolving_arrows))
+        for stroke in self.strokes:
+            dirty = dirty.united(stroke_bounds(stroke))
+        for shape in self.shapes + self.dissolving_shapes:
+            dirty = dirty.united(shape_bounds(shape))
+        if self.recorder is not None:
+            self.recorder.record("clear")
+        self.history.clear()  # Clearing cannot be undone
+        self.strokes.clear()
+        self.shapes.clear()
+        self.dissolving_shapes.clear()
         self.arrows.clear()
-        self.transparent_widget.update()
+        self.dissolving_arrows.clear()
+        self.arrow_index.clear()
+        self.dissolving_index.clear()
+        self.expiry.clear()
+        self.shape_expiry.clear()
+        self.fade_bounds = QRect()
+        self.fade_bounds_count = 0
+        del self.index_backlog[:]
+        self.index_timer.stop()
+        if self.journal is not None:
+            self.journal.compact()
+        if self.sync is not None:
+            self.sync.publish_clear()
+        self.fade_scheduler.stop()
+        self.transparent_widget.invalidate_arrow_layer()
+        if not dirty.isEmpty():
+            self.transparent_widget.update(dirty)
+        self.schedule_idle_check()
+
+    def apply_command(self, command):
+        """Apply an undo/redo command and return the one reversing it.
+
+        Returns None if the arrow, stroke or shape it refers to is gone.
+        """
+        op = command[0]
+        if op == "erase":
+            _, store, arrow_id = command
+            row = self.take_arrow(store, arrow_id)
+            return None if row is None else ("restore", store, row)
+        if op == "restore":
+            _, store, row = command
+            if row[10] and now_ms() - row[9] >= row[10]:
+                return None  # It would have dissolved by now
+            self.put_arrow(store, row)
+            return ("erase", store, row[-1])
+        if op == "erase_many":
+            _, store, ids = command
+            rows = self.take_arrows(store, ids)
+            return ("restore_many", store, rows) if rows else None
+        if op == "restore_many":
+            _, store, rows = command
+            current_time = now_ms()
+            rows = [
+                row for row in rows if not row[10] or current_time - row[9] < row[10]
+            ]
+            if not rows:
+                return None  # They would all have dissolved by now
+            self.put_arrows(store, rows)
+            return ("erase_many", store, [row[-1] for row in rows])
+        if op == "move":
+            _, store, arrow_id, dx, dy = command
+            row = self.take_arrow(store, arrow_id)
+            if row is None:
+                return None
+            self.put_arrow(store, row, dx, dy)
+            return ("move", store, arrow_id, -dx, -dy)
+        if op == "erase_stroke":
+            stroke = command[1]
+            if stroke not in self.strokes:
+                return None
+            self.take_stroke(stroke)
+            return ("restore_stroke", stroke)
+        if op == "restore_stroke":
+            stroke = command[1]
+            # Strokes stay in drawing order, which is id order
+            self.strokes.insert(
+                bisect_left(self.strokes, stroke.id, key=lambda other: other.id),
+                stroke,
+            )
+            bounds = stroke_bounds(stroke)
+            self.transparent_widget.repaint_arrow_layer(bounds)
+            self.transparent_widget.update(bounds)
+            self.schedule_idle_check()
+            return ("erase_stroke", stroke)
+        if op == "erase_shape":
+            shape = command[1]
+            if shape not in (self.dissolving_shapes if shape.lifetime else self.shapes):
+                return None
+            self.take_shape(shape)
+            return ("restore_shape", shape)
+        if op == "restore_shape":
+            shape = command[1]
+            if shape.lifetime and now_ms() - shape.created >= shape.lifetime:
+                return None  # It would have dissolved by now
+            self.put_shape(shape)
+            return ("erase_shape", shape)
+        return None
+
+    def undo(self):
+        if self.recorder is not None:
+            self.recorder.record("undo")
+        self.history.undo()
+
+    def redo(self):
+        if self.recorder is not None:
+            self.recorder.record("redo")
+        self.history.redo()
+
+    def index_for(self, store):
+        """Return the spatial index that covers the given arrow store."""
+        if store is self.arrows:
+            return self.arrow_index
+        return self.dissolving_index
+
+    def arrow_at(self, pos):
+        """Return (store, arrow_id) of the arrow closest to pos, or None."""
+        self.ensure_index()
+        x, y = pos.x(), pos.y()
+        best = None
+        best_distance = HIT_RADIUS
+        for store in (self.arrows, self.dissolving_arrows):
+            for arrow_id in self.index_for(store).query_point(x, y, HIT_RADIUS):
+                i = store.index_of(arrow_id)
+                if i is None:
+                    continue
+                distance = min(
+                    segment_distance(x, y, *segment) for segment in store.segments(i)
+                )
+                if distance <= best_distance:
+                    best, best_distance = (store, arrow_id), distance
+        return best
+
+    def take_arrow(self, store, arrow_id):
+        """Remove an arrow from its store and index and return its row."""
+        i = store.index_of(arrow_id)
+        if i is None:
+            return None
+        self.ensure_index()
+        self.index_for(store).remove(arrow_id, store.segments(i))
+        if self.sync is not None:
+            self.sync.publish_remove(store, arrow_id)
+        row = store.remove(arrow_id)
+        bounds = row_bounds(row)
+        if store is self.arrows:
+            if self.journal is not None:
+                self.journal.remove(arrow_id)
+            self.transparent_widget.repaint_arrow_layer(bounds)
+        self.transparent_widget.update(bounds)
+        self.schedule_idle_check()
+        return row
+
+    def take_arrows(self, store, ids):
+        """Remove many arrows with a single repaint and return their rows."""
+        self.ensure_index()
+        index = self.index_for(store)
+        rows = []
+        for arrow_id in ids:
+            i = store.index_of(arrow_id)
+            if i is None:
+                continue
+            index.remove(arrow_id, store.segments(i))
+            rows.append(store.row(i))
+            if self.sync is not None:
+                self.sync.publish_remove(store, arrow_id)
+            if store is self.arrows and self.journal is not None:
+                self.journal.remove(arrow_id)
+        store.remove_many([row[-1] for row in rows])
+        bounds = rows_bounds(rows)
+        if store is self.arrows:
+            self.transparent_widget.repaint_arrow_layer(bounds)
+        self.transparent_widget.update(bounds)
+        self.schedule_idle_check()
+        return rows
+
+    def put_arrows(self, store, rows):
+        """Put back rows returned by take_arrows() with a single repaint."""
+        index = self.index_for(store)
+        for row in sorted(rows, key=lambda row: row[-1]):
+            store.insert(row)
+            arrow_id = row[-1]
+            index.insert(arrow_id, store.segments(store.index_of(arrow_id)))
+            if self.sync is not None:
+                self.sync.publish_arrow(store, arrow_id)
+            if store is self.dissolving_arrows:
+                self.expiry.push(row[9] + row[10], arrow_id)
+        bounds = rows_bounds(rows)
+        if store is self.arrows:
+            if self.journal is not None:
+                self.journal.append_many([row[-1] for row in rows])
+            self.transparent_widget.repaint_arrow_layer(bounds)
+        else:
+            self.add_fade_bounds(bounds, len(rows))
+            self.fade_scheduler.request()
+        self.transparent_widget.update(bounds)
+        self.schedule_idle_check()
+
+    def put_arrow(self, store, row, dx=0, dy=0):
+        """Put back an arrow returned by take_arrow(), optionally moved."""
+        store.insert(row)
+        arrow_id = row[-1]
+        if dx or dy:
+            store.move(arrow_id, dx, dy)
+        self.index_for(store).insert(arrow_id, store.segments(store.index_of(arrow_id)))
+        if self.sync is not None:
+            self.sync.publish_arrow(store, arrow_id)
+        bounds = row_bounds(row, dx, dy)
+        if store is self.arrows:
+            if self.journal is not None:
+                self.journal.append(arrow_id)
+            self.transparent_widget.repaint_arrow_layer(bounds)
+        else:
+            self.expiry.push(row[9] + row[10], arrow_id)
+            self.add_fade_bounds(bounds)
+            self.fade_scheduler.request()
+        self.transparent_widget.update(bounds)
+        self.schedule_idle_check()
 
     def set_arrow_type(self, arrow_type):
         self.current_arrow_type = arrow_type
+        if self.recorder is not None:
+            self.recorder.record("tool", arrow_type)
+        if self._toolbar is not None:
+            self._toolbar.update_buttons(arrow_type)
+        # Hover highlighting needs move events without a pressed button
+        self.transparent_widget.setMouseTracking(arrow_type in ("eraser", "select"))
+        self.transparent_widget.set_hover(None)
+        self.transparent_widget.update_cursor()
 
     def update_dissolving_arrows(self):
-        current_time = QTime.currentTime().msecsSinceStartOfDay()
-
-        # Check if we have any dissolving arrows
-        has_dissolving = any(arrow[4] for arrow in self.arrows)
-
-        # Filter out arrows that have exceeded their 2-second lifetime
-        self.arrows = [
-            arrow
-            for arrow in self.arrows
-            if not arrow[4]  # Keep normal arrows
-            or (arrow[4] and current_time - arrow[3] < 2000)
-        ]  # Keep dissolving arrows within time
-
-        # Force update if we have any dissolving arrows
-        if has_dissolving:
-            self.transparent_widget.update()
+        current_time = now_ms()
+
+        # The area covered by dissolving arrows and shapes, including
+        # expiring ones
+        if not self.dissolving_arrows and not self.dissolving_shapes:
+            # The last ones were erased since the previous frame
+            self.fade_scheduler.stop()
+            self.fade_bounds = QRect()
+            self.fade_bounds_count = 0
+            self.schedule_idle_check()
+            return
+        dirty = self.fade_bounds
+
+        # Drop arrows that have exceeded their lifetime. Queue entries of
+        # arrows erased or put back meanwhile are stale and skipped.
+        store = self.dissolving_arrows
+        expired = []
+        for arrow_id in self.expiry.pop_expired(current_time):
+            i = store.index_of(arrow_id)
+            if i is not None and store.created[i] + store.lifetime[i] <= current_time:
+                expired.append(arrow_id)
+        if len(expired) * 2 > len(store):
+            # Most arrows are going; reindexing the survivors is cheaper
+            store.remove_many(expired)
+            self.dissolving_index.clear()
+            for i, arrow_id in enumerate(store.id):
+                self.dissolving_index.insert(arrow_id, store.segments(i))
+        else:
+            for arrow_id in expired:
+                self.dissolving_index.remove(
+                    arrow_id, store.segments(store.index_of(arrow_id))
+                )
+            store.remove_many(expired)
+
+        # Shapes leave through their own queue, stale entries skipped alike
+        shapes = self.dissolving_shapes
+        for shape_id in self.shape_expiry.pop_expired(current_time):
+            i = bisect_left(shapes, shape_id, key=lambda shape: shape.id)
+            if (
+                i < len(shapes)
+                and shapes[i].id == shape_id
+                and shapes[i].created + shapes[i].lifetime <= current_time
+            ):
+                del shapes[i]
+
+        remaining = len(store) + len(shapes)
+        if not remaining:
+            self.fade_scheduler.stop()  # Nothing left to animate
+            self.fade_bounds = QRect()
+            self.fade_bounds_count = 0
+            self.schedule_idle_check()  # Nothing fading is left to show
+        elif remaining * 2 <= self.fade_bounds_count:
+            self.update_fade_bounds()
+
+        # Only repaint the area covered by fading arrows
+        self.transparent_widget.update(dirty)
+
+    def add_fade_bounds(self, bounds, count=1):
+        """Grow the area covered by dissolving arrows and shapes by that of
+        count new ones."""
+        self.fade_bounds = self.fade_bounds.united(bounds)
+        self.fade_bounds_count += count
+
+    def update_fade_bounds(self):
+        """Recompute the area covered by dissolving arrows and shapes."""
+        bounds = store_bounds(self.dissolving_arrows)
+        for shape in self.dissolving_shapes:
+            bounds = bounds.united(shape_bounds(shape))
+        self.fade_bounds = bounds
+        self.fade_bounds_count = len(self.dissolving_arrows) + len(
+            self.dissolving_shapes
+        )
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key.Key_Escape:
-            self.arrows.clear()
-            self.transparent_widget.update()
+            self.clear_all_arrows()
+        elif event.matches(QKeySequence.StandardKey.Undo):
+            self.undo()
+        elif event.matches(QKeySequence.StandardKey.Redo):
+            self.redo()
+        elif event.key() == Qt.Key.Key_F12:
+            self.toggle_metrics_hud()
+        elif event.key() == Qt.Key.Key_F11 and metrics.enabled:
+            # Shown on the HUD, and on stderr for when the HUD is hidden
+            path = metrics.dump()
+            print(f"Metrics written to {path}", file=sys.stderr)
+            for window in self.peers():
+                window.transparent_widget.update(HUD_RECT)
+
+    def toggle_metrics_hud(self):
+        """Show or hide the metrics HUD, enabling collection when shown."""
+        metrics.hud_visible = not metrics.hud_visible
+        if metrics.hud_visible:
+            metrics.enabled = True
+        for window in self.peers():
+            if metrics.hud_visible:
+                window.hud_timer.start()
+            else:
+                window.hud_timer.stop()
+            window.transparent_widget.update(HUD_RECT)
+            window.schedule_idle_check()
 
     def toggle_drawing_mode(self):
         try:
-            print(f"Toggle drawing mode called. Current state: {self.drawing_mode}")
             self.drawing_mode = not self.drawing_mode
-            print(f"New drawing mode state: {self.drawing_mode}")
+            if self.recorder is not None:
+                self.recorder.record("mode", self.drawing_mode)
+            if metrics.enabled:
+                metrics.mark("toggle_drawing_mode", drawing_mode=self.drawing_mode)
 
             if self.drawing_mode:
-                # Enable drawing mode
+                # Enable drawing mode over the whole screen
+                self.leave_idle()
                 self.setAttribute(
                     Qt.WidgetAttribute.WA_TransparentForMouseEvents, False
                 )
-                self.setWindowFlags(self.drawing_flags)
-                self.show()
+                self.set_input_transparent(False)
+                self.raise_()
 
-                # Ensure the toolbar starts collapsed and is handled by its own logic
-                if self.toolbar.is_expanded:
-                    self.toolbar.toggle_toolbar()  # Collapse toolbar if expanded
+                if self.has_toolbar:
+                    # Ensure the toolbar starts collapsed and is handled by its own logic
+                    if self.toolbar.is_expanded:
+                        self.toolbar.toggle_toolbar()  # Collapse toolbar if expanded
 
-                self.toolbar.show()  # Show the toolbar with the toggle button
-                self.raise_()
-                self.activateWindow()
-                self.toolbar.raise_()
+                    self.toolbar.show()  # Show the toolbar with the toggle button
+                    self.activateWindow()
+                    self.toolbar.raise_()
 
             else:
                 # Disable drawing mode
                 self.setAttribute(Qt.WidgetAttribute.WA_TransparentForMouseEvents, True)
-                self.setWindowFlags(self.inactive_flags)
+                self.set_input_transparent(True)
 
                 # Ensure the toolbar is collapsed before hiding
-                if self.toolbar.is_expanded:
-                    self.toolbar.toggle_toolbar()  # Collapse toolbar if expanded
+                if self._toolbar is not None:
+                    if self._toolbar.is_expanded:
+                        self._toolbar.toggle_toolbar()  # Collapse toolbar if expanded
 
-                self.toolbar.hide()  # Hide the toolbar completely when drawing mode is off
-                self.show()
+                    self._toolbar.hide()  # Hide the toolbar completely
                 self.clearFocus()
+                self.update_idle()
 
             self.transparent_widget.update()
 
         except Exception as e:
             print(f"Error in toggle_drawing_mode: {e}")
 
+    def set_input_transparent(self, transparent):
+        """Let input pass through the overlay, or catch it, in place.
+
+        QWidget.setWindowFlags() destroys and recreates the native window,
+        dropping its backing store. Once the window exists, the flag is
+        flipped on its QWindow instead, which the platform applies to the
+        live surface (an empty input shape on X11, WS_EX_TRANSPARENT on
+        Windows); overrideWindowFlags() only keeps the widget's copy of
+        the flags in sync.
+        """
+        flags = self.inactive_flags if transparent else self.drawing_flags
+        handle = self.windowHandle()
+        if handle is None:
+            self.setWindowFlags(flags)
+        else:
+            handle.setFlag(Qt.WindowType.WindowTransparentForInput, transparent)
+            self.overrideWindowFlags(flags)
+        if not self.isVisible():
+            self.show()
+
+    def schedule_idle_check(self):
+        """Run update_idle once the current batch of changes is done."""
+        if self.idle_unmap and not self.drawing_mode:
+            self.idle_timer.start()
+
+    def update_idle(self):
+        """Unmap the overlay when empty, else shape it to its annotations.
+
+        A mapped screen-sized translucent window costs the compositor a
+        full-screen blend on every frame even when nothing is drawn on it.
+        Outside drawing mode the window is masked to the area its arrows,
+        strokes, shapes and HUD cover, and hidden altogether when that is empty.
+        The mask rather than the geometry shrinks, so arrow coordinates
+        and the arrow layer stay screen-relative. A window never shown,
+        as in a headless render, is left unshown.
+        """
+        if self.drawing_mode or not self.idle_unmap:
+            return
+        bounds = store_bounds(self.arrows).united(self.fade_bounds)
+        for stroke in self.strokes:
+            bounds = bounds.united(stroke_bounds(stroke))
+        for shape in self.shapes:
+            bounds = bounds.united(shape_bounds(shape))
+        if metrics.hud_visible:
+            bounds = bounds.united(HUD_RECT)
+        bounds = bounds.intersected(self.rect())
+        if bounds.isEmpty():
+            if self.isVisible():
+                self.hide()
+                self.idle_hidden = True
+            return
+        if bounds != self.idle_bounds:
+            grown = not self.idle_bounds.contains(bounds)
+            self.idle_bounds = bounds
+            self.setMask(QRegion(bounds))
+            if grown:
+                # Not every platform exposes the area a mask uncovers
+                self.transparent_widget.update(bounds)
+        if self.idle_hidden:
+            self.idle_hidden = False
+            # New content must not take focus from the presented application
+            self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating, True)
+            self.show()
+            self.setAttribute(Qt.WidgetAttribute.WA_ShowWithoutActivating, False)
+
+    def leave_idle(self):
+        """Drop the idle mask so the overlay covers its screen again."""
+        self.idle_timer.stop()
+        if not self.idle_bounds.isNull():
+            self.idle_bounds = QRect()
+            self.clearMask()
+        self.idle_hidden = False  # set_input_transparent maps it again
+
     def focusOutEvent(self, event):
         """Keep focus when in drawing mode"""
         super().focusOutEvent(event)
-        if self.drawing_mode:
+        # Focus moving between overlays of the group is fine
+        if self.drawing_mode and QApplication.activeWindow() not in self.peers():
             self.activateWindow()
             self.raise_()
             self.setFocus(Qt.FocusReason.ActiveWindowFocusReason)
@@ -270,12 +1319,60 @@ class FloatingToolbar(QWidget):
         )
         self.toolbar.addWidget(self.dissolving_arrow_button)
 
+        self.lifetime_button = QPushButton()
+        self.lifetime_button.setToolTip("Dissolving Arrow Lifetime")
+        self.lifetime_button.clicked.connect(parent.cycle_lifetime)
+        self.update_lifetime(parent.current_lifetime)
+        self.toolbar.addWidget(self.lifetime_button)
+
+        self.pen_button = QPushButton()
+        self.pen_button.setIcon(create_pen_icon())
+        self.pen_button.setToolTip("Freehand Pen")
+        self.pen_button.setCheckable(True)
+        self.pen_button.clicked.connect(lambda: self.handle_arrow_selection("pen"))
+        self.toolbar.addWidget(self.pen_button)
+
+        self.shape_buttons = {}
+        for kind in SHAPE_KINDS:
+            button = QPushButton()
+            button.setIcon(create_shape_icon(kind))
+            button.setToolTip(SHAPE_TOOLTIPS[kind])
+            button.setCheckable(True)
+            button.clicked.connect(
+                lambda checked, kind=kind: self.handle_arrow_selection(kind)
+            )
+            self.toolbar.addWidget(button)
+            self.shape_buttons[kind] = button
+
+        self.fade_button = QPushButton("Fade")
+        self.fade_button.setToolTip("Dissolve New Shapes and Labels")
+        self.fade_button.setCheckable(True)
+        self.fade_button.setChecked(parent.dissolve_shapes)
+        self.fade_button.clicked.connect(parent.set_dissolve_shapes)
+        self.toolbar.addWidget(self.fade_button)
+
         color_button = QPushButton("Color")
         color_button.clicked.connect(parent.choose_color)
         self.toolbar.addWidget(color_button)
 
+        self.eraser_button = QPushButton("Erase")
+        self.eraser_button.setToolTip("Erase Arrow")
+        self.eraser_button.setCheckable(True)
+        self.eraser_button.clicked.connect(
+            lambda: self.handle_arrow_selection("eraser")
+        )
+        self.toolbar.addWidget(self.eraser_button)
+
+        self.select_button = QPushButton("Select")
+        self.select_button.setToolTip("Select and Move Arrow")
+        self.select_button.setCheckable(True)
+        self.select_button.clicked.connect(
+            lambda: self.handle_arrow_selection("select")
+        )
+        self.toolbar.addWidget(self.select_button)
+
         clear_button = QPushButton("Clear")
-        clear_button.clicked.connect(parent.clear_arrows)
+        clear_button.clicked.connect(parent.clear_all_arrows)
         self.toolbar.addWidget(clear_button)
 
         # Add toolbar to layout
@@ -313,37 +1410,23 @@ class FloatingToolbar(QWidget):
         self.toolbar_container.setMaximumHeight(0)
         self.toolbar_container.hide()
 
-        # Position at top center of screen
-        screen = QApplication.primaryScreen().geometry()
-        self.setFixedWidth(200)  # Set fixed width to prevent shifting
-        self.move(screen.width() // 2 - 100, 0)  # Exactly at top edge
+        # Position at top center of the parent overlay's screen
+        width = max(200, self.toolbar.sizeHint().width())
+        self.setFixedWidth(width)  # Set fixed width to prevent shifting
+        self.place(parent.overlay_screen.geometry())
+
+    def place(self, screen):
+        """Move to the top center of the given screen geometry."""
+        # Exactly at top edge
+        self.move(screen.x() + screen.width() // 2 - self.width() // 2, screen.y())
 
     def update_toggle_button_icon(self, is_expanded):
-        # Create a custom arrow icon
+        # Rendered once per size and state, see arrow_icons
         icon_size = self.toggle_button.size()
-        pixmap = QPixmap(icon_size)
-        pixmap.fill(Qt.GlobalColor.transparent)
-
-        painter = QPainter(pixmap)
-        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-
-        # Draw arrow centered in button - arrow points up when collapsed, down when expanded
-        center_x = icon_size.width() // 2
-        points = QPolygon(
-            [
-                QPoint(center_x - 10, 14 if is_expanded else 6),  # Reversed logic
-                QPoint(center_x, 6 if is_expanded else 14),  # Reversed logic
-                QPoint(center_x + 10, 14 if is_expanded else 6),  # Reversed logic
-            ]
+        self.toggle_button.setIcon(
+            create_toggle_icon(icon_size.width(), icon_size.height(), is_expanded)
         )
 
-        painter.setPen(QPen(QColor(200, 200, 200), 2))
-        painter.setBrush(QColor(200, 200, 200))
-        painter.drawPolygon(points)
-        painter.end()
-
-        self.toggle_button.setIcon(QIcon(pixmap))
-
     def toggle_toolbar(self):
         # Toggle the expanded state
         self.is_expanded = not self.is_expanded
@@ -374,138 +1457,961 @@ class FloatingToolbar(QWidget):
         if target_height == 0:
             self.toolbar_container.hide()
 
+    def update_lifetime(self, lifetime):
+        self.lifetime_button.setText(f"{lifetime / 1000:g}s")
+
     def handle_arrow_selection(self, arrow_type):
         """Handle arrow type selection and button states"""
-        if arrow_type == "normal":
-            self.normal_arrow_button.setChecked(True)
-            self.dissolving_arrow_button.setChecked(False)
-        else:
-            self.normal_arrow_button.setChecked(False)
-            self.dissolving_arrow_button.setChecked(True)
-        self.parent().set_arrow_type(arrow_type)
+        self.parent().select_arrow_type(arrow_type)
+
+    def update_buttons(self, arrow_type):
+        """Check the button of the given arrow type and uncheck the others"""
+        buttons = {
+            "normal": self.normal_arrow_button,
+            "dissolving": self.dissolving_arrow_button,
+            "pen": self.pen_button,
+            "eraser": self.eraser_button,
+            "select": self.select_button,
+            **self.shape_buttons,
+        }
+        for button_type, button in buttons.items():
+            button.setChecked(button_type == arrow_type)
 
 
-class TransparentWidget(QWidget):
+class OverlayCanvas:
+    """Pointer handling and painting shared by the overlay widgets.
+
+    Has no Qt base so it can be mixed into both QWidget and QOpenGLWidget;
+    the concrete widget class comes after it in the bases.
+    """
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAttribute(Qt.WidgetAttribute.WA_TranslucentBackground)
         self.start_point = None
         self.end_point = None
+        self.current_bounds = QRect()  # Area covered by the in-progress arrow
         self.drawing = False
+        self.stroke = None  # StrokeBuilder of the freehand stroke in progress
+        self.stroke_damage = QRect()  # Stroke area changed since the last frame
+        self.label_pos = None  # Where the text tool was pressed
+        self.hover = None  # (store, arrow_id) under the eraser/select cursor
+        self.hover_bounds = QRect()
+        self.erasing = False
+        self.selected = None  # (store, row) of the arrow being dragged
+        self.drag_origin = None
+        self.drag_offset = QPoint()
+
+        # Pointer input is coalesced: move events record the latest position
+        # and it is applied at most once per display frame
+        self.pending_pos = None
+        self.erase_pos = None
+        self.display_end = None  # End point drawn, possibly predicted ahead
+        # Draw the in-progress arrow slightly ahead of the pointer to hide latency
+        self.predict_motion = bool(os.environ.get("ARROWS_PREDICT_MOTION"))
+        self.motion_samples = deque(maxlen=MOTION_SAMPLES)
+        self.frame_timer = QTimer(self)
+        self.frame_timer.setSingleShot(True)
+        self.frame_timer.setTimerType(Qt.TimerType.PreciseTimer)
+        self.frame_timer.timeout.connect(self.next_pointer_frame)
+        self.setAttribute(Qt.WidgetAttribute.WA_AcceptTouchEvents)
+
         self.default_cursor = Qt.CursorShape.ArrowCursor
         self.drawing_cursor = Qt.CursorShape.CrossCursor
+        self.tool_cursors = {
+            "eraser": Qt.CursorShape.PointingHandCursor,
+            "select": Qt.CursorShape.SizeAllCursor,
+        }
         self.setCursor(self.default_cursor)
 
+    # Called by the window when committed content changes; widgets that
+    # cache committed content override them
+    def invalidate_arrow_layer(self):
+        pass
+
+    def repaint_arrow_layer(self, rect):
+        pass
+
+    def add_to_arrow_layer(self, start, end, color):
+        pass
+
+    def add_rows_to_arrow_layer(self, rows):
+        pass
+
+    def add_stroke_to_layer(self, stroke):
+        pass
+
+    def add_shape_to_layer(self, shape):
+        pass
+
+    def draw_shapes(self, painter, shapes):
+        """Draw finished shapes from their cached paths and laid out text."""
+        painter.setFont(label_font())
+        for shape in shapes:
+            if shape.static_text is None:
+                painter.fillPath(shape.path, shape.color())
+            else:
+                painter.setPen(shape.color())
+                painter.drawStaticText(shape.rect.topLeft(), shape.static_text)
+
+    def draw_dissolving_shapes(self, painter, dirty, current_time):
+        """Draw the dissolving shapes touching dirty at their current opacity."""
+        for shape in self.parent().dissolving_shapes:
+            age = current_time - shape.created
+            if age >= shape.lifetime or not shape_bounds(shape).intersects(dirty):
+                continue
+            # Same opacity buckets as dissolving arrows
+            step = round(OPACITY_STEPS * (1.0 - age / shape.lifetime))
+            painter.setOpacity(step / OPACITY_STEPS)
+            self.draw_shapes(painter, [shape])
+        painter.setOpacity(1.0)
+
+    def draw_strokes(self, painter, strokes):
+        """Draw finished strokes from their cached paths."""
+        pen = self.stroke_pen()
+        for stroke in strokes:
+            pen.setColor(QColor.fromRgba(stroke.rgba))
+            painter.setPen(pen)
+            painter.drawPath(stroke.path)
+
+    def stroke_pen(self, color=None):
+        pen = QPen(color or QColor())
+        pen.setWidth(PEN_WIDTH)
+        pen.setCapStyle(Qt.PenCapStyle.RoundCap)
+        pen.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
+        return pen
+
+    def group_rows(self, rows):
+        """Batch the lines of fully opaque arrows by color."""
+        groups = {}
+        for row in rows:
+            key = (row[8], OPACITY_STEPS)
+            lines = groups.get(key)
+            if lines is None:
+                lines = groups[key] = []
+            lines.extend(arrow_lines(*row[:8]))
+        return groups
+
+    def draw_line_groups(self, painter, pen, groups):
+        """Draw batched arrow lines keyed by (rgba, opacity step)."""
+        for (rgba, step), lines in groups.items():
+            painter.setOpacity(step / OPACITY_STEPS)
+            pen.setColor(QColor.fromRgba(rgba))
+            painter.setPen(pen)
+            painter.drawLines(lines)
+
     def update_cursor(self):
         if self.parent().drawing_mode:
-            self.setCursor(self.drawing_cursor)
+            self.setCursor(
+                self.tool_cursors.get(
+                    self.parent().current_arrow_type, self.drawing_cursor
+                )
+            )
         else:
             self.setCursor(self.default_cursor)
 
+    def set_hover(self, hit):
+        """Highlight the arrow under the cursor, repainting only what changed."""
+        if hit == self.hover:
+            return
+        old_bounds = self.hover_bounds
+        self.hover = hit
+        self.hover_bounds = QRect()
+        if hit is not None:
+            store, arrow_id = hit
+            self.hover_bounds = row_bounds(store.row(store.index_of(arrow_id)))
+        self.update(old_bounds.united(self.hover_bounds))
+
+    def erase_at(self, pos):
+        window = self.parent()
+        hit = window.arrow_at(pos)
+        if hit is not None:
+            self.set_hover(None)
+            store = hit[0]
+            window.history.record(("restore", store, window.take_arrow(*hit)))
+            return
+        stroke = window.stroke_at(pos)
+        if stroke is not None:
+            window.take_stroke(stroke)
+            window.history.record(("restore_stroke", stroke))
+            return
+        shape = window.shape_at(pos)
+        if shape is not None:
+            window.take_shape(shape)
+            window.history.record(("restore_shape", shape))
+
     def mousePressEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton and self.parent().drawing_mode:
-            self.update_cursor()
-            self.drawing = True
-            self.start_point = event.pos()
-            self.end_point = event.pos()
-            print(f"Drawing mode: {self.parent().drawing_mode}")
-            print(f"Mouse press at: {self.start_point.x()}, {self.start_point.y()}")
-            self.update()  # Force immediate update
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.pointer_press(event.position().toPoint())
 
     def mouseMoveEvent(self, event):
-        if self.drawing:
-            self.end_point = event.pos()
-            self.update()
+        self.pointer_move(event.position().toPoint(), event.timestamp())
 
     def mouseReleaseEvent(self, event):
-        if event.button() == Qt.MouseButton.LeftButton and self.drawing:
+        if event.button() == Qt.MouseButton.LeftButton:
+            self.pointer_release(event.position().toPoint())
+
+    def tabletEvent(self, event):
+        # Accepting tablet events stops Qt from synthesizing mouse events,
+        # so pen input goes through the same coalescing pipeline
+        pos = event.position().toPoint()
+        if event.type() == QEvent.Type.TabletPress:
+            self.pointer_press(pos)
+        elif event.type() == QEvent.Type.TabletMove:
+            self.pointer_move(pos, event.timestamp())
+        elif event.type() == QEvent.Type.TabletRelease:
+            self.pointer_release(pos)
+        event.accept()
+
+    def event(self, event):
+        if event.type() in (
+            QEvent.Type.TouchBegin,
+            QEvent.Type.TouchUpdate,
+            QEvent.Type.TouchEnd,
+        ):
+            if not event.points():
+                return False
+            pos = event.points()[0].position().toPoint()
+            if event.type() == QEvent.Type.TouchBegin:
+                self.pointer_press(pos)
+            elif event.type() == QEvent.Type.TouchUpdate:
+                self.pointer_move(pos, event.timestamp())
+            else:
+                self.pointer_release(pos)
+            event.accept()
+            return True
+        return super().event(event)
+
+    def pointer_press(self, pos):
+        recorder = self.parent().recorder
+        if recorder is not None:
+            recorder.record("press", pos.x(), pos.y())
+        if not self.parent().drawing_mode:
+            return
+        if metrics.enabled:
+            metrics.input_event()
+        self.pending_pos = None
+        self.motion_samples.clear()
+        tool = self.parent().current_arrow_type
+        if tool == "eraser":
+            self.erasing = True
+            self.erase_pos = pos
+            self.erase_at(pos)
+        elif tool == "select":
+            hit = self.parent().arrow_at(pos)
+            if hit is not None:
+                self.set_hover(None)
+                store, arrow_id = hit
+                self.selected = (store, self.parent().take_arrow(store, arrow_id))
+                self.drag_origin = pos
+                self.drag_offset = QPoint()
+                self.update(row_bounds(self.selected[1]))
+                if self.selected[1][10]:
+                    # Out of its store it is faded by the pointer frames
+                    self.frame_timer.setInterval(
+                        self.parent().fade_scheduler.interval()
+                    )
+                    self.frame_timer.start()
+        elif tool == "pen":
+            self.stroke = StrokeBuilder(pos.x(), pos.y())
+            self.stroke_damage = QRect()
+            self.update(self.stroke_segment_bounds(pos, pos))
+        elif tool == "text":
+            self.label_pos = pos  # The label is placed on release
+        else:
+            self.update_cursor()
+            self.drawing = True
+            self.start_point = pos
+            self.end_point = pos
+            self.display_end = pos
+            self.current_bounds = arrow_bounds(self.start_point, self.end_point)
+            self.update(self.current_bounds)
+
+    def pointer_move(self, pos, timestamp):
+        """Queue a pointer position; it is applied at most once per frame.
+
+        The first move after an idle frame is applied immediately, later ones
+        only record the latest position until the frame timer fires.
+        """
+        if metrics.enabled:
+            metrics.input_event()
+        recorder = self.parent().recorder
+        if recorder is not None:
+            recorder.record("move", pos.x(), pos.y())
+        if self.stroke is not None:
+            # Every sample is fed to the stroke; only repaints wait for a frame
+            self.extend_stroke(pos)
+        self.pending_pos = pos
+        if self.predict_motion:
+            self.motion_samples.append((pos, timestamp))
+        if not self.frame_timer.isActive():
+            self.flush_pointer()
+            self.frame_timer.setInterval(self.parent().fade_scheduler.interval())
+            self.frame_timer.start()
+
+    def next_pointer_frame(self):
+        if self.pending_pos is not None:
+            self.flush_pointer()
+            self.frame_timer.start()  # Keep throttling while input keeps coming
+        elif self.selected is not None and self.selected[1][10]:
+            # A dissolving arrow held still keeps fading
+            row = self.selected[1]
+            self.update(row_bounds(row, self.drag_offset.x(), self.drag_offset.y()))
+            if now_ms() - row[9] < row[10]:
+                self.frame_timer.start()
+
+    def flush_pointer(self):
+        """Apply the most recent pointer position queued since the last frame."""
+        pos = self.pending_pos
+        if pos is None:
+            return
+        self.pending_pos = None
+        if self.erasing:
+            # Erase along the path travelled since the last frame
+            dx = pos.x() - self.erase_pos.x()
+            dy = pos.y() - self.erase_pos.y()
+            steps = max(1, int(max(abs(dx), abs(dy)) / HIT_RADIUS))
+            for step in range(1, steps + 1):
+                self.erase_at(
+                    QPoint(
+                        self.erase_pos.x() + dx * step // steps,
+                        self.erase_pos.y() + dy * step // steps,
+                    )
+                )
+            self.erase_pos = pos
+        elif self.selected is not None:
+            row = self.selected[1]
+            old_bounds = row_bounds(row, self.drag_offset.x(), self.drag_offset.y())
+            self.drag_offset = pos - self.drag_origin
+            new_bounds = row_bounds(row, self.drag_offset.x(), self.drag_offset.y())
+            self.update(old_bounds.united(new_bounds))
+        elif self.stroke is not None:
+            self.update(self.stroke_damage)
+            self.stroke_damage = QRect()
+        elif self.drawing:
+            self.end_point = pos
+            self.display_end = self.predicted_point(pos)
+            # Repaint where the arrow was and where it is now
+            old_bounds = self.current_bounds
+            self.current_bounds = arrow_bounds(self.start_point, self.display_end)
+            self.update(old_bounds.united(self.current_bounds))
+        elif self.parent().current_arrow_type in self.tool_cursors:
+            self.set_hover(self.parent().arrow_at(pos))
+
+    def stroke_segment_bounds(self, *points):
+        return (
+            QRect(points[0], points[0])
+            .united(QRect(points[-1], points[-1]))
+            .normalized()
+            .adjusted(-PEN_WIDTH, -PEN_WIDTH, PEN_WIDTH, PEN_WIDTH)
+        )
+
+    def extend_stroke(self, pos):
+        """Feed a pointer sample to the stroke and note the area it changed."""
+        anchor = QPoint(*self.stroke.anchor())
+        old_tail = QPoint(*self.stroke.tail())
+        if self.stroke.add(pos.x(), pos.y()):
+            # The segment from the anchor to the tail is replaced or committed
+            self.stroke_damage = self.stroke_damage.united(
+                self.stroke_segment_bounds(anchor, old_tail).united(
+                    self.stroke_segment_bounds(old_tail, pos)
+                )
+            )
+
+    def predicted_point(self, pos):
+        """Extrapolate the pointer one frame ahead from its recent velocity."""
+        if not self.predict_motion or len(self.motion_samples) < 2:
+            return pos
+        (old_pos, old_time), (new_pos, new_time) = (
+            self.motion_samples[0],
+            self.motion_samples[-1],
+        )
+        elapsed = new_time - old_time
+        if elapsed <= 0:
+            return pos
+        lead = self.frame_timer.interval() / elapsed
+        dx = (new_pos.x() - old_pos.x()) * lead
+        dy = (new_pos.y() - old_pos.y()) * lead
+        # Never extrapolate further than the pointer moved in the sample window
+        scale = min(1.0, MAX_PREDICTION / max(1.0, abs(dx), abs(dy)))
+        return QPoint(int(pos.x() + dx * scale), int(pos.y() + dy * scale))
+
+    def pointer_release(self, pos):
+        recorder = self.parent().recorder
+        if recorder is not None:
+            recorder.record("release", pos.x(), pos.y())
+        self.frame_timer.stop()
+        if self.erasing:
+            self.pending_pos = pos
+            self.flush_pointer()
+            self.erasing = False
+        elif self.selected is not None:
+            self.pending_pos = pos
+            self.flush_pointer()
+            store, row = self.selected
+            self.selected = None
+            self.update(row_bounds(row, self.drag_offset.x(), self.drag_offset.y()))
+            dx, dy = self.drag_offset.x(), self.drag_offset.y()
+            self.parent().put_arrow(store, row, dx, dy)
+            if dx or dy:
+                self.parent().history.record(("move", store, row[-1], -dx, -dy))
+        elif self.stroke is not None:
+            self.extend_stroke(pos)
+            self.update(self.stroke_damage)
+            stroke, self.stroke = self.stroke, None
+            self.stroke_damage = QRect()
+            self.parent().add_stroke(stroke, self.parent().current_color)
+        elif self.label_pos is not None:
+            pos, self.label_pos = self.label_pos, None
+            self.parent().place_label(pos, self.parent().current_color)
+        elif self.drawing:
             self.drawing = False
-            if self.start_point and self.end_point:
-                # Store arrow with its color, creation time, and type
-                current_time = QTime.currentTime().msecsSinceStartOfDay()
-                is_dissolving = self.parent().current_arrow_type == "dissolving"
-                self.parent().arrows.append(
-                    (
-                        self.start_point,
-                        self.end_point,
+            self.end_point = pos
+            tool = self.parent().current_arrow_type
+            if tool in BOX_KINDS:
+                if self.start_point != self.end_point:  # A click draws nothing
+                    self.parent().add_shape(
+                        tool,
+                        QRect(self.start_point, self.end_point),
                         self.parent().current_color,
-                        current_time,
-                        is_dissolving,
                     )
+            elif self.start_point and self.end_point:
+                # Store arrow with its color, creation time, and type
+                is_dissolving = tool == "dissolving"
+                self.parent().add_arrow(
+                    self.start_point,
+                    self.end_point,
+                    self.parent().current_color,
+                    is_dissolving,
                 )
-                print(
-                    f"Arrow added: from ({self.start_point.x()}, {self.start_point.y()}) to ({self.end_point.x()}, {self.end_point.y()})"
+            self.update(self.current_bounds)
+            self.current_bounds = QRect()
+        self.pending_pos = None
+        self.motion_samples.clear()
+
+    def paint_dynamic(self, painter, pen, dirty):
+        """Paint what changes while editing: drags, hover, strokes and arrows
+        in progress, and the metrics HUD."""
+        # Draw the arrow being dragged by the select tool
+        if self.selected is not None:
+            row = self.selected[1]
+            lifetime = row[10]
+            if lifetime:
+                # Same opacity buckets as the dissolving arrows left in place
+                age = now_ms() - row[9]
+                step = max(0, round(OPACITY_STEPS * (1.0 - age / lifetime)))
+                painter.setOpacity(step / OPACITY_STEPS)
+            else:
+                painter.setOpacity(1.0)
+            pen.setColor(QColor.fromRgba(row[8]))
+            painter.setPen(pen)
+            painter.drawLines(
+                list(row_lines(row, self.drag_offset.x(), self.drag_offset.y()))
+            )
+
+        # Outline the arrow under the eraser/select cursor
+        if self.hover is not None and self.hover_bounds.intersects(dirty):
+            store, arrow_id = self.hover
+            i = store.index_of(arrow_id)
+            if i is not None:
+                painter.setOpacity(1.0)
+                highlight = QPen(QColor(255, 255, 255, 120))
+                highlight.setWidth(PEN_WIDTH + 4)
+                painter.setPen(highlight)
+                painter.drawLines(list(row_lines(store.row(i))))
+                painter.setPen(pen)
+
+        # Draw the stroke in progress: its path so far plus the pending tail
+        if self.stroke is not None:
+            painter.setOpacity(1.0)
+            stroke_pen = self.stroke_pen(self.parent().current_color)
+            painter.setPen(stroke_pen)
+            painter.drawPath(self.stroke.path)
+            anchor_x, anchor_y = self.stroke.anchor()
+            tail_x, tail_y = self.stroke.tail()
+            painter.drawLine(anchor_x, anchor_y, tail_x, tail_y)
+            painter.setPen(pen)
+
+        # Draw current arrow or shape if drawing (with current color)
+        if self.drawing and self.start_point and self.end_point:
+            painter.setOpacity(1.0)
+            tool = self.parent().current_arrow_type
+            if tool in BOX_KINDS:
+                # Built once per frame; committed shapes keep theirs
+                preview = make_shape(
+                    None,
+                    tool,
+                    self.parent().current_color.rgba(),
+                    QRect(self.start_point, self.display_end),
+                    PEN_WIDTH,
                 )
-                print(f"Total arrows: {len(self.parent().arrows)}")
-            self.update()
+                painter.fillPath(preview.path, preview.color())
+            else:
+                pen.setColor(self.parent().current_color)
+                painter.setPen(pen)
+                self.draw_arrow(painter, self.start_point, self.display_end)
+
+        if metrics.hud_visible and HUD_RECT.intersects(dirty):
+            self.draw_metrics_hud(painter)
+
+    def draw_metrics_hud(self, painter):
+        painter.setOpacity(1.0)
+        painter.fillRect(HUD_RECT, QColor(0, 0, 0, 180))
+        painter.setPen(QColor(230, 230, 230))
+        painter.drawText(
+            HUD_RECT.adjusted(8, 4, -8, -4),
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+            "\n".join(metrics.hud_lines()),
+        )
+
+    def draw_arrow(self, painter, start, end):
+        hx1, hy1, hx2, hy2 = arrow_head(
+            start.x(), start.y(), end.x(), end.y(), ARROW_HEAD_LENGTH, ARROW_HEAD_ANGLE
+        )
+        painter.drawLines(
+            list(
+                arrow_lines(start.x(), start.y(), end.x(), end.y(), hx1, hy1, hx2, hy2)
+            )
+        )
+
+
+class TransparentWidget(OverlayCanvas, QWidget):
+    """Raster overlay caching committed arrows, strokes and shapes in a pixmap."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.arrow_layer = None  # Offscreen raster of committed normal arrows
+
+    def invalidate_arrow_layer(self):
+        """Drop the arrow layer so it is rebuilt on the next paint."""
+        self.arrow_layer = None
+
+    def ensure_arrow_layer(self):
+        """Return the arrow layer, rasterizing all normal arrows if needed."""
+        dpr = self.devicePixelRatioF()
+        size = self.size() * dpr
+        if (
+            self.arrow_layer is None
+            or self.arrow_layer.size() != size
+            or self.arrow_layer.devicePixelRatio() != dpr
+        ):
+            self.arrow_layer = QPixmap(size)
+            self.arrow_layer.setDevicePixelRatio(dpr)
+            self.arrow_layer.fill(Qt.GlobalColor.transparent)
+            painter = self.begin_layer_painter()
+            self.draw_line_groups(
+                painter, painter.pen(), self.group_rows(self.parent().arrows.rows())
+            )
+            self.draw_strokes(painter, self.parent().strokes)
+            self.draw_shapes(painter, self.parent().shapes)
+            painter.end()
+        return self.arrow_layer
+
+    def repaint_arrow_layer(self, rect):
+        """Re-rasterize the part of the arrow layer inside rect."""
+        if self.arrow_layer is None:
+            return
+        self.parent().ensure_index()
+        store = self.parent().arrows
+        ids = self.parent().arrow_index.query_rect(
+            rect.left() - PEN_WIDTH,
+            rect.top() - PEN_WIDTH,
+            rect.right() + PEN_WIDTH,
+            rect.bottom() + PEN_WIDTH,
+        )
+        # Keep the original stacking order by drawing in id order
+        rows = [store.row(store.index_of(arrow_id)) for arrow_id in sorted(ids)]
+        painter = self.begin_layer_painter()
+        painter.setClipRect(rect)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_Source)
+        painter.fillRect(rect, Qt.GlobalColor.transparent)
+        painter.setCompositionMode(QPainter.CompositionMode.CompositionMode_SourceOver)
+        self.draw_line_groups(painter, painter.pen(), self.group_rows(rows))
+        self.draw_strokes(
+            painter,
+            [
+                stroke
+                for stroke in self.parent().strokes
+                if stroke_bounds(stroke).intersects(rect)
+            ],
+        )
+        self.draw_shapes(
+            painter,
+            [
+                shape
+                for shape in self.parent().shapes
+                if shape_bounds(shape).intersects(rect)
+            ],
+        )
+        painter.end()
+
+    def add_to_arrow_layer(self, start, end, color):
+        """Rasterize a newly committed normal arrow into the existing layer."""
+        if self.arrow_layer is None:
+            return  # Built with all arrows on the next paint
+        painter = self.begin_layer_painter()
+        pen = painter.pen()
+        pen.setColor(color)
+        painter.setPen(pen)
+        self.draw_arrow(painter, start, end)
+        painter.end()
+
+    def add_rows_to_arrow_layer(self, rows):
+        """Rasterize a batch of newly committed ArrowStore rows in one pass."""
+        if self.arrow_layer is None:
+            return  # Built with all arrows on the next paint
+        painter = self.begin_layer_painter()
+        self.draw_line_groups(painter, painter.pen(), self.group_rows(rows))
+        painter.end()
+
+    def add_stroke_to_layer(self, stroke):
+        """Rasterize a newly committed stroke into the existing layer."""
+        if self.arrow_layer is None:
+            return  # Built with all strokes on the next paint
+        painter = self.begin_layer_painter()
+        self.draw_strokes(painter, [stroke])
+        painter.end()
+
+    def add_shape_to_layer(self, shape):
+        """Rasterize a newly committed permanent shape into the existing layer."""
+        if self.arrow_layer is None:
+            return  # Built with all shapes on the next paint
+        painter = self.begin_layer_painter()
+        self.draw_shapes(painter, [shape])
+        painter.end()
+
+    def begin_layer_painter(self):
+        painter = QPainter(self.arrow_layer)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        pen = QPen()
+        pen.setWidth(PEN_WIDTH)
+        painter.setPen(pen)
+        return painter
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.invalidate_arrow_layer()
 
     def paintEvent(self, event):
+        if metrics.enabled:
+            paint_start = now_us()
         painter = QPainter(self)
         painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        dirty = event.rect()
 
         # Add very slight background when in drawing mode
         if self.parent().drawing_mode:
             painter.fillRect(
-                self.rect(), QColor(255, 255, 255, 3)
+                dirty, QColor(255, 255, 255, 3)
             )  # 1% opacity white background
 
         # Set pen for drawing
         pen = QPen(self.parent().current_color)
-        pen.setWidth(4)  # Make lines thicker
+        pen.setWidth(PEN_WIDTH)  # Make lines thicker
         painter.setPen(pen)
 
-        # Draw all saved arrows with their colors and opacity
-        current_time = QTime.currentTime().msecsSinceStartOfDay()
-        for start, end, color, creation_time, is_dissolving in self.parent().arrows:
-            if is_dissolving:
-                age = current_time - creation_time
-                if age >= 2000:  # 2 seconds
-                    continue
-                opacity = 1.0 - (age / 2000.0)
-                painter.setOpacity(opacity)
-            else:
-                painter.setOpacity(1.0)
-
-            pen.setColor(color)
-            painter.setPen(pen)
-            self.draw_arrow(painter, start, end)
-
-        # Draw current arrow if drawing (with current color)
-        if self.drawing and self.start_point and self.end_point:
-            pen.setColor(self.parent().current_color)
+        # Composite the damaged part of the committed normal arrows
+        layer = self.ensure_arrow_layer()
+        dpr = layer.devicePixelRatio()
+        source = QRectF(
+            dirty.x() * dpr, dirty.y() * dpr, dirty.width() * dpr, dirty.height() * dpr
+        )
+        painter.drawPixmap(QRectF(dirty), layer, source)
+
+        # Draw dissolving arrows touching the damaged area, batched by color
+        # and opacity bucket
+        left = dirty.left() - ARROW_MARGIN
+        top = dirty.top() - ARROW_MARGIN
+        right = dirty.right() + ARROW_MARGIN
+        bottom = dirty.bottom() + ARROW_MARGIN
+        current_time = now_ms()
+        groups = {}
+        for row in self.parent().dissolving_arrows.rows():
+            x1, y1, x2, y2 = row[:4]
+            if (
+                max(x1, x2) < left
+                or min(x1, x2) > right
+                or max(y1, y2) < top
+                or min(y1, y2) > bottom
+            ):
+                continue
+            age = current_time - row[9]
+            lifetime = row[10]
+            if lifetime and age >= lifetime:
+                continue
+            step = (
+                round(OPACITY_STEPS * (1.0 - age / lifetime))
+                if lifetime
+                else OPACITY_STEPS
+            )
+            lines = groups.get((row[8], step))
+            if lines is None:
+                lines = groups[(row[8], step)] = []
+            lines.extend(arrow_lines(*row[:8]))
+        self.draw_line_groups(painter, pen, groups)
+        self.draw_dissolving_shapes(painter, dirty, current_time)
+
+        self.paint_dynamic(painter, pen, dirty)
+        if metrics.enabled:
+            painter.end()
+            metrics.paint(
+                paint_start,
+                dirty.width() * dirty.height(),
+                len(self.parent().arrows) + len(self.parent().dissolving_arrows),
+            )
+
+
+@lru_cache(maxsize=None)
+def widget_class():
+    """Return the overlay widget class for the renderer set in ARROWS_RENDERER.
+
+    'opengl' selects GLTransparentWidget when an OpenGL 4.1 context can be
+    created; anything else, or no usable OpenGL, selects the raster widget.
+    """
+    if os.environ.get("ARROWS_RENDERER") != "opengl":
+        return TransparentWidget
+    from gl_renderer import opengl_available
+
+    if not opengl_available():
+        print("OpenGL 4.1 is not available, falling back to the raster renderer")
+        return TransparentWidget
+    return gl_widget_class()
+
+
+@lru_cache(maxsize=None)
+def gl_widget_class():
+    # QtOpenGLWidgets is only imported when the OpenGL renderer is used
+    from PyQt6.QtOpenGLWidgets import QOpenGLWidget
+    from gl_renderer import ArrowRenderer, surface_format
+
+    class GLTransparentWidget(OverlayCanvas, QOpenGLWidget):
+        """Overlay widget drawing committed arrows with ArrowRenderer.
+
+        There is no arrow layer: every frame draws all arrows from vertex
+        buffers, which are only re-uploaded when a store changes. Strokes,
+        shapes and everything in progress are painted with QPainter on top.
+        """
+
+        def __init__(self, parent=None):
+            super().__init__(parent)
+            self.setFormat(surface_format())
+            self.renderer = None
+            # Whether normal arrows were only appended since the last frame,
+            # so only the new rows need uploading
+            self.append_only = True
+
+        def initializeGL(self):
+            try:
+                self.renderer = ArrowRenderer(self.context(), PEN_WIDTH)
+            except RuntimeError as e:
+                print(
+                    f"OpenGL renderer failed, falling back to the raster renderer: {e}",
+                    file=sys.stderr,
+                )
+                # Not from inside this GL callback, which the widget is in
+                QTimer.singleShot(0, self.parent().use_raster_widget)
+
+        def invalidate_arrow_layer(self):
+            self.append_only = False
+
+        def repaint_arrow_layer(self, rect):
+            self.append_only = False
+
+        def paintGL(self):
+            if self.renderer is None:
+                return  # Being replaced by the raster widget
+            if metrics.enabled:
+                paint_start = now_us()
+            window = self.parent()
+            # Same 1% white tint as the raster widget, premultiplied
+            background = 3 / 255 if window.drawing_mode else 0.0
+            self.renderer.draw(
+                self.width(),
+                self.height(),
+                background,
+                window.arrows,
+                window.dissolving_arrows,
+                now_ms(),
+                self.append_only,
+            )
+            self.append_only = True
+
+            painter = QPainter(self)
+            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+            self.draw_strokes(painter, window.strokes)
+            self.draw_shapes(painter, window.shapes)
+            self.draw_dissolving_shapes(painter, self.rect(), now_ms())
+            pen = QPen(window.current_color)
+            pen.setWidth(PEN_WIDTH)
             painter.setPen(pen)
-            self.draw_arrow(painter, self.start_point, self.end_point)
+            self.paint_dynamic(painter, pen, self.rect())
+            painter.end()
+            if metrics.enabled:
+                metrics.paint(
+                    paint_start,
+                    self.width() * self.height(),
+                    len(window.arrows) + len(window.dissolving_arrows),
+                )
 
-    def draw_arrow(self, painter, start, end):
-        painter.drawLine(start, end)
+    return GLTransparentWidget
 
-        # Calculate arrow head
-        angle = 30  # degrees
-        arrow_length = 20
-        dx = end.x() - start.x()
-        dy = end.y() - start.y()
-        line_angle = math.atan2(dy, dx)
 
-        angle1 = line_angle + math.pi / 180 * (180 - angle)
-        angle2 = line_angle + math.pi / 180 * (180 + angle)
+class ScreenOverlays(QObject):
+    """One overlay window per screen, following screens as they come and go.
 
-        x1 = end.x() + arrow_length * math.cos(angle1)
-        y1 = end.y() + arrow_length * math.sin(angle1)
-        x2 = end.x() + arrow_length * math.cos(angle2)
-        y2 = end.y() + arrow_length * math.sin(angle2)
+    Each overlay keeps its own arrows and backing store at its screen's
+    resolution, so drawing on one screen never repaints the others. Tool,
+    color and drawing mode are shared; the toolbar lives on the primary one.
+    """
 
-        painter.drawLine(end, QPoint(int(x1), int(y1)))
-        painter.drawLine(end, QPoint(int(x2), int(y2)))
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.overlays = {}  # QScreen -> TransparentWindow
+        self.drawing_mode = False
+        for screen in app.screens():
+            self.add_screen(screen)
+        app.screenAdded.connect(self.add_screen)
+        app.screenRemoved.connect(self.remove_screen)
+        app.primaryScreenChanged.connect(self.update_primary)
+        app.aboutToQuit.connect(self.close_sessions)
+
+    def windows(self):
+        return list(self.overlays.values())
+
+    def primary(self):
+        return self.overlays.get(self.app.primaryScreen())
+
+    def add_screen(self, screen):
+        window = TransparentWindow(screen, self)
+        # Adopt the shared state of the overlays already present
+        template = self.primary() or next(iter(self.overlays.values()), None)
+        if template is not None:
+            window.current_color = template.current_color
+            window.dissolve_shapes = template.dissolve_shapes
+            window.set_arrow_type(template.current_arrow_type)
+        if self.drawing_mode:
+            window.toggle_drawing_mode()
+        self.overlays[screen] = window
+        self.update_primary()
+        path = session_path("session-" + screen.name().replace(os.sep, "_"))
+        if path is not None:
+            window.load_session(path)
+        window.show()
+
+    def remove_screen(self, screen):
+        # Arrows drawn on a screen that is unplugged stay in its journal and
+        # come back when it is plugged in again
+        window = self.overlays.pop(screen, None)
+        if window is None:
+            return
+        window.close_session()
+        if window._toolbar is not None:
+            window._toolbar.hide()
+        window.close()
+        window.deleteLater()
+        self.update_primary()
+
+    def update_primary(self):
+        primary = self.primary()
+        for window in self.windows():
+            window.has_toolbar = window is primary
+            if window._toolbar is not None and window is not primary:
+                window._toolbar.hide()
+
+    def close_sessions(self):
+        for window in self.windows():
+            window.close_session()
 
+    def toggle_drawing_mode(self):
+        self.drawing_mode = not self.drawing_mode
+        for window in self.windows():
+            window.toggle_drawing_mode()
 
-def main():
-    app = QApplication(sys.argv)
-    window = TransparentWindow()
-    window.show()
+    def clear_arrows(self):
+        for window in self.windows():
+            window.clear_arrows()
+
+    def select_arrow_type(self, arrow_type):
+        for window in self.windows():
+            window.set_arrow_type(arrow_type)
+
+
+def elapsed_ms():
+    return (time.perf_counter() - _START) * 1000
+
+
+def start(argv):
+    """Create the application, arm the hotkey and build the overlay.
+
+    The hotkey is armed before anything else is constructed; the toolbar,
+    its stylesheets and icons wait until drawing mode is first enabled.
+    """
+    # Let Qt merge queued high-rate mouse and tablet moves before delivery
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_CompressHighFrequencyEvents)
+    QApplication.setAttribute(Qt.ApplicationAttribute.AA_CompressTabletEvents)
+    STARTUP_TIMINGS["imports"] = elapsed_ms()
+    app = QApplication(argv)
+    app.setApplicationName("Arrows")
+    STARTUP_TIMINGS["application"] = elapsed_ms()
+
+    # Set up keyboard manager (imported here because pynput needs a display
+    # server at import time, and the window must stay importable headless).
+    # Hotkey signals are queued, so nothing is lost before the window exists.
+    from keyboard_manager import KeyboardManager
+
+    keyboard_manager = KeyboardManager(
+        backend=os.environ.get("ARROWS_HOTKEY_BACKEND", "auto")
+    )
+    STARTUP_TIMINGS["hotkey_ready"] = elapsed_ms()
+
+    # ARROWS_SCREENS=all puts an overlay on every screen instead of the primary
+    if os.environ.get("ARROWS_SCREENS") == "all":
+        window = ScreenOverlays(app)
+    else:
+        window = TransparentWindow()
+        path = session_path()
+        if path is not None:
+            window.load_session(path)
+            app.aboutToQuit.connect(window.close_session)
+        window.show()
+    STARTUP_TIMINGS["window_shown"] = elapsed_ms()
+
+    # ARROWS_SYNC=publish or subscribe shares the primary overlay's arrows
+    # with other machines, at ARROWS_SYNC_ADDRESS (host:port)
+    sync_mode = os.environ.get("ARROWS_SYNC")
+    if sync_mode:
+        overlay = window.primary() if isinstance(window, ScreenOverlays) else window
+        sync = overlay.start_sync(sync_mode, os.environ.get("ARROWS_SYNC_ADDRESS", ""))
+        app.aboutToQuit.connect(sync.close)
+
+    # ARROWS_RECORD=<file> records the primary overlay's session for replay
+    record_path = os.environ.get("ARROWS_RECORD")
+    if record_path:
+        from recording import Recorder
+
+        overlay = window.primary() if isinstance(window, ScreenOverlays) else window
+        overlay.recorder = Recorder(overlay, record_path)
+        app.aboutToQuit.connect(overlay.recorder.close)
+
+    # ARROWS_API=on lets local scripts add arrows through annotation_api.py
+    if os.environ.get("ARROWS_API") == "on":
+        from annotation_api import AnnotationServer, DEFAULT_NAME
+
+        overlay = window.primary() if isinstance(window, ScreenOverlays) else window
+        AnnotationServer(overlay, os.environ.get("ARROWS_API_NAME", DEFAULT_NAME))
 
-    # Set up keyboard manager
-    keyboard_manager = KeyboardManager()
     keyboard_manager.drawing_mode_toggled.connect(window.toggle_drawing_mode)
+    keyboard_manager.clear_requested.connect(window.clear_arrows)
+    keyboard_manager.arrow_type_requested.connect(window.select_arrow_type)
+
+    if metrics.enabled:
+        metrics.mark("startup", **STARTUP_TIMINGS)
+    return app, window, keyboard_manager
+
+
+def main():
+    app, window, keyboard_manager = start(sys.argv)
 
     # Start Qt event loop
     sys.exit(app.exec())
@@ -0,0 +1,142 @@
+from functools import lru_cache
+from PyQt6.QtCore import QPointF, QRectF, Qt
+from PyQt6.QtGui import (
+    QColor,
+    QFont,
+    QPainterPath,
+    QPainterPathStroker,
+    QStaticText,
+    QTransform,
+)
+
+BOX_KINDS = ("rectangle", "ellipse", "highlight")  # Dragged out, see make_shape()
+SHAPE_KINDS = BOX_KINDS + ("text",)  # Labels are placed with make_label()
+HIGHLIGHT_ALPHA = 80  # Highlight boxes are filled with their color at this alpha
+LABEL_POINT_SIZE = 20
+LABEL_PADDING = 4  # Margin kept around a label's text for hit testing and damage
+
+
+@lru_cache(maxsize=None)
+def label_font():
+    """Return the font labels are laid out and drawn with."""
+    font = QFont()
+    font.setPointSize(LABEL_POINT_SIZE)
+    font.setBold(True)
+    return font
+
+
+class Shape:
+    """A finished shape or text label with its prebuilt geometry.
+
+    Everything painting needs is computed once here: outlines are stroked
+    into a fill path and label text is laid out in a QStaticText, so a
+    repaint only fills paths and blits glyphs.
+    """
+
+    __slots__ = (
+        "id",
+        "kind",
+        "rgba",
+        "rect",
+        "created",
+        "lifetime",
+        "path",
+        "static_text",
+        "extent",
+    )
+
+    def __init__(
+        self, shape_id, kind, rgba, rect, created, lifetime, path, static_text=None
+    ):
+        self.id = shape_id
+        self.kind = kind
+        self.rgba = rgba
+        self.rect = rect  # QRectF of the shape, or of a label's text
+        self.created = created
+        self.lifetime = lifetime  # 0 for shapes that never fade
+        self.path = path  # Filled when painted; None for labels
+        self.static_text = static_text  # Laid out label text, for labels
+        if static_text is not None:
+            outline = rect.adjusted(
+                -LABEL_PADDING, -LABEL_PADDING, LABEL_PADDING, LABEL_PADDING
+            )
+        else:
+            outline = path.boundingRect()
+        # (left, top, right, bottom) in whole pixels, covering antialiasing
+        self.extent = (
+            int(outline.left()) - 1,
+            int(outline.top()) - 1,
+            int(outline.right()) + 2,
+            int(outline.bottom()) + 2,
+        )
+
+    def hit(self, x, y, radius):
+        """Return whether (x, y) is within radius of the shape.
+
+        Outlines are hit near their edge, filled boxes and labels anywhere
+        inside.
+        """
+        rect = self.rect
+        if self.kind in ("highlight", "text"):
+            return rect.adjusted(-radius, -radius, radius, radius).contains(x, y)
+        if self.kind == "rectangle":
+            outer = rect.adjusted(-radius, -radius, radius, radius)
+            inner = rect.adjusted(radius, radius, -radius, -radius)
+            return outer.contains(x, y) and not (
+                inner.isValid() and inner.contains(x, y)
+            )
+        # Ellipse: compare the normalized radius with the band around 1
+        center = rect.center()
+        a, b = rect.width() / 2, rect.height() / 2
+        if a <= radius or b <= radius:
+            return rect.adjusted(-radius, -radius, radius, radius).contains(x, y)
+        dx, dy = x - center.x(), y - center.y()
+        outer = (dx / (a + radius)) ** 2 + (dy / (b + radius)) ** 2
+        inner = (dx / (a - radius)) ** 2 + (dy / (b - radius)) ** 2
+        return outer <= 1.0 <= inner
+
+    def color(self):
+        color = QColor.fromRgba(self.rgba)
+        if self.kind == "highlight":
+            color.setAlpha(HIGHLIGHT_ALPHA)
+        return color
+
+
+def outline_path(kind, rect, width):
+    """Return the path filled to draw a shape of kind over rect."""
+    path = QPainterPath()
+    if kind == "ellipse":
+        path.addEllipse(rect)
+    else:
+        path.addRect(rect)
+    if kind == "highlight":
+        return path
+    stroker = QPainterPathStroker()
+    stroker.setWidth(width)
+    stroker.setJoinStyle(Qt.PenJoinStyle.RoundJoin)
+    return stroker.createStroke(path).simplified()
+
+
+def make_shape(shape_id, kind, rgba, rect, width, created=0, lifetime=0):
+    """Build a rectangle, ellipse or highlight box over the QRect rect."""
+    if kind not in BOX_KINDS:
+        raise ValueError(f"Unknown shape kind: {kind!r}")
+    rect = QRectF(rect).normalized()
+    return Shape(
+        shape_id,
+        kind,
+        rgba,
+        rect,
+        created,
+        lifetime,
+        outline_path(kind, rect, width),
+    )
+
+
+def make_label(shape_id, text, rgba, x, y, created=0, lifetime=0):
+    """Build a text label whose top left corner is at (x, y)."""
+    static_text = QStaticText(text)
+    static_text.setTextFormat(Qt.TextFormat.PlainText)
+    static_text.prepare(QTransform(), label_font())
+    rect = QRectF(QPointF(x, y), static_text.size())
+    return Shape(shape_id, "text", rgba, rect, created, lifetime, None, static_text)
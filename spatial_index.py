@@ -0,0 +1,82 @@
+import math
+
+DEFAULT_CELL_SIZE = 64
+
+
+def segment_distance(px, py, x1, y1, x2, y2):
+    """Return the distance from point (px, py) to the segment (x1, y1)-(x2, y2)."""
+    dx = x2 - x1
+    dy = y2 - y1
+    length_sq = dx * dx + dy * dy
+    if length_sq == 0:
+        return math.hypot(px - x1, py - y1)
+    t = max(0.0, min(1.0, ((px - x1) * dx + (py - y1) * dy) / length_sq))
+    return math.hypot(px - (x1 + t * dx), py - (y1 + t * dy))
+
+
+class SpatialIndex:
+    """Uniform grid mapping cells to the ids of the segments crossing them.
+
+    Each id is registered in every cell its segments actually pass through,
+    so a lookup only touches the few cells around the query point no matter
+    how many arrows are on screen. Inserts and removals are incremental.
+    """
+
+    def __init__(self, cell_size=DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        self.cells.clear()
+
+    def segment_cells(self, x1, y1, x2, y2):
+        """Yield every grid cell the segment passes through."""
+        size = self.cell_size
+        if y1 > y2:
+            x1, y1, x2, y2 = x2, y2, x1, y1
+        dy = y2 - y1
+        for cy in range(math.floor(y1 / size), math.floor(y2 / size) + 1):
+            # Clip the segment to this row of cells to find its x-range
+            if dy:
+                top = max(y1, cy * size)
+                bottom = min(y2, (cy + 1) * size)
+                xa = x1 + (x2 - x1) * (top - y1) / dy
+                xb = x1 + (x2 - x1) * (bottom - y1) / dy
+            else:
+                xa, xb = x1, x2
+            if xa > xb:
+                xa, xb = xb, xa
+            for cx in range(math.floor(xa / size), math.floor(xb / size) + 1):
+                yield (cx, cy)
+
+    def insert(self, item_id, segments):
+        for segment in segments:
+            for cell in self.segment_cells(*segment):
+                ids = self.cells.get(cell)
+                if ids is None:
+                    ids = self.cells[cell] = set()
+                ids.add(item_id)
+
+    def remove(self, item_id, segments):
+        for segment in segments:
+            for cell in self.segment_cells(*segment):
+                ids = self.cells.get(cell)
+                if ids is not None:
+                    ids.discard(item_id)
+                    if not ids:
+                        del self.cells[cell]
+
+    def query_rect(self, left, top, right, bottom):
+        """Return the ids of segments crossing any cell in the given rect."""
+        size = self.cell_size
+        found = set()
+        for cy in range(math.floor(top / size), math.floor(bottom / size) + 1):
+            for cx in range(math.floor(left / size), math.floor(right / size) + 1):
+                ids = self.cells.get((cx, cy))
+                if ids:
+                    found |= ids
+        return found
+
+    def query_point(self, x, y, radius):
+        """Return candidate ids for segments within radius of (x, y)."""
+        return self.query_rect(x - radius, y - radius, x + radius, y + radius)
@@ -0,0 +1,83 @@
+from array import array
+from PyQt6.QtCore import QPointF
+from PyQt6.QtGui import QPainterPath
+from spatial_index import segment_distance
+
+DEFAULT_TOLERANCE = 1.5  # Max distance in pixels a dropped point may deviate
+MIN_SPACING = 2  # Points closer than this to the last one are ignored
+MAX_PENDING = 64  # Longest run of points checked before one is committed
+
+
+class Stroke:
+    """A finished freehand stroke with its prebuilt painter path."""
+
+    __slots__ = ("id", "rgba", "path", "points", "extent")
+
+    def __init__(self, stroke_id, rgba, path, points, extent):
+        self.id = stroke_id
+        self.rgba = rgba
+        self.path = path
+        self.points = points  # Flat array of x, y of the kept vertices
+        self.extent = extent  # (left, top, right, bottom) of the vertices
+
+    def segments(self):
+        points = self.points
+        for i in range(0, len(points) - 2, 2):
+            yield points[i], points[i + 1], points[i + 2], points[i + 3]
+
+
+class StrokeBuilder:
+    """Simplify a freehand stroke online as its points arrive.
+
+    Points are buffered while they all stay within tolerance of the line
+    from the last kept vertex to the newest point. Once one strays, the
+    previous point becomes a vertex and is appended to the path. Memory and
+    paint cost follow the shape of the stroke, not the input rate.
+    """
+
+    def __init__(self, x, y, tolerance=DEFAULT_TOLERANCE):
+        self.tolerance = tolerance
+        self.path = QPainterPath(QPointF(x, y))
+        self.points = array("i", (x, y))
+        self.extent = [x, y, x, y]
+        self.pending = []  # Points since the last vertex, newest last
+
+    def anchor(self):
+        """Return the last kept vertex."""
+        return self.points[-2], self.points[-1]
+
+    def tail(self):
+        """Return the newest point, drawn from the anchor while in progress."""
+        return self.pending[-1] if self.pending else self.anchor()
+
+    def add(self, x, y):
+        """Add a point; return False if it was too close to matter."""
+        tail_x, tail_y = self.tail()
+        if max(abs(x - tail_x), abs(y - tail_y)) < MIN_SPACING:
+            return False
+        anchor_x, anchor_y = self.anchor()
+        if len(self.pending) < MAX_PENDING and all(
+            segment_distance(px, py, anchor_x, anchor_y, x, y) <= self.tolerance
+            for px, py in self.pending
+        ):
+            self.pending.append((x, y))
+        else:
+            self.commit(*self.pending[-1])
+            self.pending = [(x, y)]
+        return True
+
+    def commit(self, x, y):
+        self.points.extend((x, y))
+        self.path.lineTo(x, y)
+        extent = self.extent
+        extent[0] = min(extent[0], x)
+        extent[1] = min(extent[1], y)
+        extent[2] = max(extent[2], x)
+        extent[3] = max(extent[3], y)
+
+    def finish(self, stroke_id, rgba):
+        """Keep the newest point and return the completed Stroke."""
+        if self.pending:
+            self.commit(*self.pending[-1])
+            self.pending = []
+        return Stroke(stroke_id, rgba, self.path, self.points, tuple(self.extent))
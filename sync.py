@@ -0,0 +1,395 @@
+import asyncio
+import struct
+import threading
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from animation import now_ms
+from arrow_store import KIND_DISSOLVING, KIND_NORMAL
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 47800
+RECONNECT_DELAY = 1.0  # Seconds between subscriber connection attempts
+MAX_BUFFERED = 8 << 20  # Subscribers lagging by more bytes are dropped
+
+FRAME = struct.Struct("<I")  # Payload size of each batch
+COLOR = struct.Struct("<I")
+
+# Message ops, in the low bits of each message's first byte
+OP_ADD = 1
+OP_REMOVE = 2
+OP_CLEAR = 3
+FLAG_DISSOLVING = 0x10  # The arrow belongs to the dissolving store
+FLAG_COLOR = 0x20  # A new color follows; otherwise the previous one is reused
+
+
+def write_varint(out, value):
+    """Append an unsigned LEB128 varint to the bytearray out."""
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_signed(out, value):
+    write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)  # Zigzag
+
+
+def read_varint(data, offset):
+    """Return (value, offset past it) of the varint at offset."""
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def read_signed(data, offset):
+    value, offset = read_varint(data, offset)
+    return (value >> 1) ^ -(value & 1), offset
+
+
+def encode_batch(events, now):
+    """Encode sync events as one self-contained binary batch.
+
+    Events are ("add", row) with an ArrowStore row, ("remove", kind, id) or
+    ("clear",). Ids are sent as the difference from the previous id of the
+    same store, start points as the difference from the previous arrow's
+    and end points relative to their start, all as zigzag varints, and a
+    color only when it changes, so a typical arrow costs about 8 bytes.
+    Dissolving arrows carry their lifetime and current age instead of a
+    creation time, which keeps the peers' clocks out of it.
+    """
+    out = bytearray()
+    last_ids = [0, 0]  # Per kind
+    last_x = last_y = last_rgba = 0
+    for event in events:
+        if event[0] == "add":
+            x1, y1, x2, y2 = event[1][:4]
+            rgba, created, lifetime, kind, arrow_id = event[1][8:]
+            op = OP_ADD
+            if kind == KIND_DISSOLVING:
+                op |= FLAG_DISSOLVING
+            if rgba != last_rgba:
+                op |= FLAG_COLOR
+            out.append(op)
+            write_signed(out, arrow_id - last_ids[kind])
+            last_ids[kind] = arrow_id
+            write_signed(out, x1 - last_x)
+            write_signed(out, y1 - last_y)
+            write_signed(out, x2 - x1)
+            write_signed(out, y2 - y1)
+            last_x, last_y = x1, y1
+            if op & FLAG_COLOR:
+                out += COLOR.pack(rgba)
+                last_rgba = rgba
+            if kind == KIND_DISSOLVING:
+                write_varint(out, lifetime)
+                write_varint(out, max(0, now - created))
+        elif event[0] == "remove":
+            _, kind, arrow_id = event
+            out.append(OP_REMOVE | (FLAG_DISSOLVING if kind == KIND_DISSOLVING else 0))
+            write_signed(out, arrow_id - last_ids[kind])
+            last_ids[kind] = arrow_id
+        else:
+            out.append(OP_CLEAR)
+    return bytes(out)
+
+
+def decode_batch(data):
+    """Decode a batch into ("add", kind, id, x1, y1, x2, y2, rgba, lifetime,
+    age), ("remove", kind, id) and ("clear",) events."""
+    events = []
+    last_ids = [0, 0]
+    last_x = last_y = last_rgba = 0
+    offset = 0
+    while offset < len(data):
+        op = data[offset]
+        offset += 1
+        kind = KIND_DISSOLVING if op & FLAG_DISSOLVING else 0
+        if op & 0x0F == OP_CLEAR:
+            events.append(("clear",))
+            continue
+        delta, offset = read_signed(data, offset)
+        arrow_id = last_ids[kind] = last_ids[kind] + delta
+        if op & 0x0F == OP_REMOVE:
+            events.append(("remove", kind, arrow_id))
+            continue
+        dx1, offset = read_signed(data, offset)
+        dy1, offset = read_signed(data, offset)
+        dx2, offset = read_signed(data, offset)
+        dy2, offset = read_signed(data, offset)
+        x1 = last_x = last_x + dx1
+        y1 = last_y = last_y + dy1
+        if op & FLAG_COLOR:
+            (last_rgba,) = COLOR.unpack_from(data, offset)
+            offset += COLOR.size
+        lifetime = age = 0
+        if kind == KIND_DISSOLVING:
+            lifetime, offset = read_varint(data, offset)
+            age, offset = read_varint(data, offset)
+        events.append(
+            (
+                "add",
+                kind,
+                arrow_id,
+                x1,
+                y1,
+                x1 + dx2,
+                y1 + dy2,
+                last_rgba,
+                lifetime,
+                age,
+            )
+        )
+    return events
+
+
+def parse_address(address):
+    """Split 'host:port', 'port' or '' into (host, port) with defaults."""
+    host, _, port = address.rpartition(":")
+    return host or DEFAULT_HOST, int(port) if port else DEFAULT_PORT
+
+
+class SyncPublisher(QObject):
+    """Serve a window's arrow changes to subscribers on a TCP socket.
+
+    Changes are queued as they are made and flushed once the event loop
+    is idle again, so everything changed while handling one input event
+    goes out as a single delta-encoded batch. An asyncio loop on its own
+    thread runs the server; the GUI thread hands it finished frames with
+    call_soon_threadsafe. A new subscriber first receives a snapshot of
+    the arrows on screen, then only the batches of changes.
+    """
+
+    # Emitted from the server thread; delivered queued on the GUI thread
+    subscriber_joined = pyqtSignal(object)
+
+    def __init__(self, window, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__()
+        self.window = window
+        self.pending = []
+        self.bytes_sent = 0  # Frame bytes handed to the server, per subscriber
+        self.writers = set()  # Only touched on the server thread
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(0)
+        self.flush_timer.timeout.connect(self.flush)
+        self.subscriber_joined.connect(self.send_snapshot)
+
+        self.loop = asyncio.new_event_loop()
+        self.error = None
+        self.ready = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, args=(host, port), name="arrows-sync", daemon=True
+        )
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+
+    def publish_arrow(self, store, arrow_id):
+        """Queue an arrow added to, or put back into, the store."""
+        self.queue(("add", store.row(store.index_of(arrow_id))))
+
+    def publish_remove(self, store, arrow_id):
+        kind = KIND_DISSOLVING if store is self.window.dissolving_arrows else 0
+        self.queue(("remove", kind, arrow_id))
+
+    def publish_clear(self):
+        self.pending.clear()  # Nothing queued before a clear matters
+        self.queue(("clear",))
+
+    def queue(self, event):
+        self.pending.append(event)
+        if not self.flush_timer.isActive():
+            self.flush_timer.start()
+
+    def flush(self):
+        if not self.pending:
+            return
+        self.send(self.pending, self.broadcast)
+        self.pending = []
+
+    def send(self, events, deliver, *args):
+        payload = encode_batch(events, now_ms())
+        frame = FRAME.pack(len(payload)) + payload
+        self.bytes_sent += len(frame)
+        self.loop.call_soon_threadsafe(deliver, *args, frame)
+
+    def send_snapshot(self, writer):
+        """Send a joining subscriber every arrow, then admit it to broadcasts."""
+        self.flush()  # Earlier changes are in the snapshot, don't send them again
+        window = self.window
+        events = [
+            ("add", store.row(i))
+            for store in (window.arrows, window.dissolving_arrows)
+            for i in range(len(store))
+        ]
+        self.send([("clear",)] + events, self.admit, writer)
+
+    def close(self):
+        self.flush()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    # The methods below run on the server thread
+
+    def run(self, host, port):
+        asyncio.set_event_loop(self.loop)
+        try:
+            server = self.loop.run_until_complete(
+                asyncio.start_server(self.handle, host, port)
+            )
+        except OSError as error:
+            self.error = error
+            self.ready.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+        server.close()
+        for writer in self.writers:
+            writer.close()
+        self.loop.run_until_complete(server.wait_closed())
+        self.loop.close()
+
+    async def handle(self, reader, writer):
+        self.subscriber_joined.emit(writer)
+        try:
+            await reader.read()  # Subscribers never send; wait for them to go
+        except OSError:
+            pass
+        self.writers.discard(writer)
+        writer.close()
+
+    def admit(self, writer, frame):
+        if not writer.is_closing():
+            writer.write(frame)
+            self.writers.add(writer)
+
+    def broadcast(self, frame):
+        for writer in list(self.writers):
+            if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+                self.writers.discard(writer)  # Stalled; it resyncs on reconnect
+                writer.close()
+            else:
+                writer.write(frame)
+
+
+class SyncSubscriber(QObject):
+    """Mirror the arrows of a SyncPublisher into a window.
+
+    A client on its own asyncio thread reads batches and hands them to
+    the GUI thread through a queued signal, where each batch is applied
+    incrementally. Publisher ids are mapped to the window's own ids, so
+    arrows can still be drawn locally. After a lost connection it keeps
+    reconnecting and starts over from the publisher's snapshot.
+    """
+
+    batch_received = pyqtSignal(bytes)
+
+    def __init__(self, window, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        super().__init__()
+        self.window = window
+        self.address = (host, port)
+        self.remote_ids = {}  # (kind, publisher id) -> local id
+        self.batch_received.connect(self.apply)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.run, name="arrows-sync", daemon=True)
+        self.thread.start()
+
+    def store_for(self, kind):
+        window = self.window
+        return window.dissolving_arrows if kind == KIND_DISSOLVING else window.arrows
+
+    def apply(self, payload):
+        window = self.window
+        added = {KIND_NORMAL: [], KIND_DISSOLVING: []}  # Committed in bulk
+        for event in decode_batch(payload):
+            if event[0] == "add" and (event[1], event[2]) not in self.remote_ids:
+                added[event[1]].append(event)
+                continue
+            self.commit(added)
+            if event[0] == "clear":
+                self.clear_remote()
+                continue
+            kind, remote_id = event[1], event[2]
+            local_id = self.remote_ids.pop((kind, remote_id), None)
+            if local_id is not None:
+                window.take_arrow(self.store_for(kind), local_id)
+            if event[0] == "add":
+                added[kind].append(event)  # Moved and re-sent
+        self.commit(added)
+        if (
+            len(self.remote_ids)
+            > 2 * (len(window.arrows) + len(window.dissolving_arrows)) + 1024
+        ):
+            self.prune()
+
+    def commit(self, added):
+        """Add the arrows collected by apply() and map their ids."""
+        current_time = now_ms()
+        for kind, events in added.items():
+            if not events:
+                continue
+            ids = self.window.commit_arrows(
+                self.store_for(kind),
+                [event[3:8] + (current_time - event[9], event[8]) for event in events],
+                kind,
+            )
+            self.remote_ids.update(zip(((kind, event[2]) for event in events), ids))
+            events.clear()
+
+    def clear_remote(self):
+        """Take every arrow received from the publisher off the window."""
+        for kind in (KIND_NORMAL, KIND_DISSOLVING):
+            self.window.take_arrows(
+                self.store_for(kind),
+                [
+                    local_id
+                    for key, local_id in self.remote_ids.items()
+                    if key[0] == kind
+                ],
+            )
+        self.remote_ids.clear()
+
+    def prune(self):
+        """Forget ids of arrows that dissolved or were erased locally."""
+        self.remote_ids = {
+            key: local_id
+            for key, local_id in self.remote_ids.items()
+            if self.store_for(key[0]).index_of(local_id) is not None
+        }
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    # The methods below run on the client thread
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        task = self.loop.create_task(self.receive())
+        self.loop.run_forever()
+        task.cancel()
+        self.loop.run_until_complete(asyncio.gather(task, return_exceptions=True))
+        self.loop.close()
+
+    async def receive(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(*self.address)
+            except OSError:
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            try:
+                while True:
+                    (size,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+                    self.batch_received.emit(await reader.readexactly(size))
+            except (asyncio.IncompleteReadError, OSError):
+                pass
+            finally:
+                writer.close()
+            await asyncio.sleep(RECONNECT_DELAY)